@@ -0,0 +1,122 @@
+# benchmark.py
+# Benchmark the Rubik's cube and pancake solvers on seeded random scrambles.
+#
+# Every case runs in a fresh worker process, so the peak memory reported for a case
+# is its own, and a case that runs past the time limit can be stopped. Results are
+# printed as a table and can be saved as JSON to compare runs between versions.
+
+import argparse
+from contextlib import redirect_stdout
+import io
+import json
+from multiprocessing import Process, Queue
+import platform
+from queue import Empty
+import random
+import resource
+import time
+import pancake
+import rubiks
+
+parser = argparse.ArgumentParser(description="Benchmark the Rubik's cube and pancake solvers")
+parser.add_argument('--depths', type=int, nargs='+', default=[4, 6, 8], help="scramble depths (quarter turns) for the cube")
+parser.add_argument('--solvers', nargs='+', default=['astar', 'idastar', 'bidirectional'],
+                    choices=['astar', 'idastar', 'bidirectional', 'hdastar', 'beam_search', 'twophase'], help="cube solvers to run")
+parser.add_argument('--pancakes', type=int, nargs='+', default=[8, 10, 12], help="stack sizes for the pancake solver")
+parser.add_argument('--runs', type=int, default=3, help="number of scrambles per depth or stack size")
+parser.add_argument('--seed', type=int, default=0, help="seed of the first scramble")
+parser.add_argument('--timeout', type=float, default=60, help="seconds before a case is stopped")
+parser.add_argument('--json', help="file to write the results to as JSON")
+
+def scramble(depth, seed):
+    '''Return the cube state reached from the solved cube by depth random quarter turns.'''
+    rng = random.Random(seed)
+    state = [i for i in range(6) for _ in range(rubiks.SIZE ** 2)]
+    for _ in range(depth):
+        face, direction = rng.choice(rubiks.ACTIONS)
+        rubiks.rotate(state, face, direction)
+    return state
+
+def shuffle(n, seed):
+    '''Return a stack of n pancakes shuffled by a seeded random number generator.'''
+    stack = list(range(n))
+    random.Random(seed).shuffle(stack)
+    return stack
+
+def run_case(solver, state, results):
+    '''Run one benchmark case: a solver name and a puzzle state. Puts on results the
+    number of nodes searched (from the solver's stats), the wall time in seconds, the
+    peak memory of the process in kilobytes and the solution length in moves or flips
+    (None if no solution was found). gbfs returns its flips as one string, so its
+    length also comes from its stats.'''
+    solve = pancake.gbfs if solver == 'gbfs' else getattr(rubiks, solver)
+    args = (None, state) if solver == 'gbfs' else (state,)
+    stats = {}
+
+    # The Solvers Report Progress on Standard Output: Silence It
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        solution = solve(*args, stats=stats)
+    elapsed = time.perf_counter() - start
+
+    if solver == 'gbfs':
+        length = stats['length']
+    else:
+        length = len(solution) if solution is not None else None
+    results.put({'nodes': stats['nodes'],
+                 'time': elapsed,
+                 'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 'length': length})
+
+def run(cases, timeout):
+    '''Run every (name, solver, puzzle state) case in a fresh process, one at a time,
+    and return a list of result dicts. A case that takes longer than timeout seconds
+    is stopped and recorded as timed out.'''
+    results = []
+    for name, solver, state in cases:
+        result = {'case': name, 'solver': solver}
+        queue = Queue()
+        process = Process(target=run_case, args=(solver, state, queue))
+        process.start()
+        try:
+            result.update(queue.get(timeout=timeout))
+            result['nodes_per_sec'] = result['nodes'] / result['time'] if result['nodes'] and result['time'] else None
+        except Empty:
+            result['timeout'] = True
+            process.terminate()
+        process.join()
+        results.append(result)
+        print_row(result)
+    return results
+
+def print_row(result):
+    '''Print one line of the results table.'''
+    if result.get('timeout'):
+        print(f"{result['case']:<16} {result['solver']:<14} {'timed out':>10}")
+        return
+    nodes = result['nodes'] if result['nodes'] is not None else '-'
+    rate = f"{result['nodes_per_sec']:.0f}" if result['nodes_per_sec'] else '-'
+    length = result['length'] if result['length'] is not None else '-'
+    print(f"{result['case']:<16} {result['solver']:<14} {nodes:>10} {rate:>10} "
+          f"{result['time']:>9.3f} {result['peak_kb'] / 1024:>9.1f} {length:>7}")
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    # Build the Cases: Cube Scrambles for Every Solver, then Pancake Stacks for GBFS
+    cases = []
+    for depth in args.depths:
+        for run_id in range(args.runs):
+            state = scramble(depth, args.seed + run_id)
+            cases += [(f'cube d={depth} #{run_id}', solver, state) for solver in args.solvers]
+    for n in args.pancakes:
+        for run_id in range(args.runs):
+            cases.append((f'pancake n={n} #{run_id}', 'gbfs', shuffle(n, args.seed + run_id)))
+
+    print(f"{'case':<16} {'solver':<14} {'nodes':>10} {'nodes/s':>10} {'time (s)':>9} {'peak MB':>9} {'length':>7}")
+    results = run(cases, args.timeout)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'args': vars(args), 'results': results}, f, indent=2)
@@ -0,0 +1,270 @@
+# cubie.py
+# Cubie-level view of a 3x3 Rubik's cube: which corner and edge cubie sits in
+# each position, and how it is twisted or flipped there.
+#
+# A cube is a (cp, co, ep, eo) tuple of 8 corner positions and twists and 12 edge
+# positions and flips, and a move is a small permutation and orientation-delta
+# table of the same shape. Coordinates number the parts of a cube (corner twists,
+# edge flips, permutations) as small integers, and coordinate move tables turn a
+# move into a single lookup: the pattern databases and the two-phase solver are
+# built on them.
+
+from array import array
+from math import comb
+
+# Sticker indices follow rubiks.py: faces are stored in the order U, L, F, R, B, D
+# with 9 stickers each, row by row as drawn in the GUI net.
+
+# Corner positions URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB. Each corner lists its
+# U/D sticker first, then the other two stickers in clockwise order.
+CORNER_FACELETS = [(8, 27, 20), (6, 18, 11), (0, 9, 38), (2, 36, 29),
+                   (47, 26, 33), (45, 17, 24), (51, 44, 15), (53, 35, 42)]
+
+# Edge positions UR, UF, UL, UB, DR, DF, DL, DB, FR, FL, BL, BR. Each edge lists its
+# U/D sticker first (F/B sticker for the four middle-layer edges).
+EDGE_FACELETS = [(5, 28), (7, 19), (3, 10), (1, 37), (50, 34), (46, 25),
+                 (48, 16), (52, 43), (23, 30), (21, 14), (41, 12), (39, 32)]
+
+# Faces (sticker blocks) of each solved corner and edge, in facelet order
+CORNER_FACES = [tuple(i // 9 for i in facelets) for facelets in CORNER_FACELETS]
+EDGE_FACES = [tuple(i // 9 for i in facelets) for facelets in EDGE_FACELETS]
+
+# Clockwise quarter turns as (corner perm, corner twist, edge perm, edge flip).
+# After the move, position i holds the cubie that was in position perm[i], with
+# its orientation increased by the twist/flip of position i.
+_CLOCKWISE = {
+    'U': ([3, 0, 1, 2, 4, 5, 6, 7], [0] * 8,
+          [3, 0, 1, 2, 4, 5, 6, 7, 8, 9, 10, 11], [0] * 12),
+    'R': ([4, 1, 2, 0, 7, 5, 6, 3], [2, 0, 0, 1, 1, 0, 0, 2],
+          [8, 1, 2, 3, 11, 5, 6, 7, 4, 9, 10, 0], [0] * 12),
+    'F': ([1, 5, 2, 3, 0, 4, 6, 7], [1, 2, 0, 0, 2, 1, 0, 0],
+          [0, 9, 2, 3, 4, 8, 6, 7, 1, 5, 10, 11], [0, 1, 0, 0, 0, 1, 0, 0, 1, 1, 0, 0]),
+    'D': ([0, 1, 2, 3, 5, 6, 7, 4], [0] * 8,
+          [0, 1, 2, 3, 5, 6, 7, 4, 8, 9, 10, 11], [0] * 12),
+    'L': ([0, 2, 6, 3, 4, 1, 5, 7], [0, 1, 2, 0, 0, 2, 1, 0],
+          [0, 1, 10, 3, 4, 5, 9, 7, 8, 2, 6, 11], [0] * 12),
+    'B': ([0, 1, 3, 7, 4, 5, 2, 6], [0, 0, 1, 2, 0, 0, 2, 1],
+          [0, 1, 2, 11, 4, 5, 6, 10, 8, 9, 3, 7], [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1]),
+}
+
+def multiply(cube, move):
+    '''Apply a move (or any cubie-level cube used as a move) to a cube.
+    Both are (cp, co, ep, eo) tuples; the result is a new tuple.'''
+    cp, co, ep, eo = cube
+    mcp, mco, mep, meo = move
+    return (tuple(cp[i] for i in mcp),
+            tuple((co[j] + t) % 3 for j, t in zip(mcp, mco)),
+            tuple(ep[i] for i in mep),
+            tuple((eo[j] + f) % 2 for j, f in zip(mep, meo)))
+
+# The solved cube: every cubie home, none twisted or flipped
+SOLVED = (tuple(range(8)), (0,) * 8, tuple(range(12)), (0,) * 12)
+
+def _compile_moves():
+    '''Build the cubie-level tables of the 12 quarter turns and 6 half turns, keyed
+    like rubiks.MOVES.'''
+    moves = {}
+    for face, (cp, co, ep, eo) in _CLOCKWISE.items():
+        cw = (tuple(cp), tuple(co), tuple(ep), tuple(eo))
+        moves[face, 'CW'] = cw
+        moves[face, '180'] = multiply(cw, cw)
+        moves[face, 'CCW'] = multiply(moves[face, '180'], cw)
+    return moves
+
+# Cubie-level tables of the 12 quarter turns and 6 half turns, keyed by (face, direction)
+MOVES = _compile_moves()
+
+def from_stickers(state):
+    '''Convert a 54-sticker state to a cubie-level (cp, co, ep, eo) tuple.
+    Colors are matched to faces through the center stickers, which never move.
+    Raises ValueError if a corner or edge has a color combination that does not
+    exist on a real cube.'''
+    face_of = {state[4 + 9 * face]: face for face in range(6)}
+
+    cp, co = [], []
+    for facelets in CORNER_FACELETS:
+        faces = tuple(face_of[state[i]] for i in facelets)
+        for twist in range(3):
+            turned = faces[twist:] + faces[:twist]
+            if turned in CORNER_FACES:
+                cp.append(CORNER_FACES.index(turned))
+                co.append(twist)
+                break
+        else:
+            raise ValueError(f'no corner has the colors {faces}')
+
+    ep, eo = [], []
+    for facelets in EDGE_FACELETS:
+        faces = tuple(face_of[state[i]] for i in facelets)
+        for flip in range(2):
+            turned = faces[flip:] + faces[:flip]
+            if turned in EDGE_FACES:
+                ep.append(EDGE_FACES.index(turned))
+                eo.append(flip)
+                break
+        else:
+            raise ValueError(f'no edge has the colors {faces}')
+
+    return tuple(cp), tuple(co), tuple(ep), tuple(eo)
+
+def to_stickers(cube):
+    '''Convert a cubie-level (cp, co, ep, eo) tuple to a 54-sticker state, the inverse
+    of from_stickers() for a state whose centers have colors 0-5 in face order.'''
+    cp, co, ep, eo = cube
+    state = [face for face in range(6) for _ in range(9)]
+    for facelets, corner, twist in zip(CORNER_FACELETS, cp, co):
+        for k, face in enumerate(CORNER_FACES[corner]):
+            state[facelets[(k + twist) % 3]] = face
+    for facelets, edge, flip in zip(EDGE_FACELETS, ep, eo):
+        for k, face in enumerate(EDGE_FACES[edge]):
+            state[facelets[(k + flip) % 2]] = face
+    return state
+
+def rank(positions, n):
+    '''Rank a sequence of distinct positions chosen from range(n) as an integer in
+    range(n * (n-1) * ... * (n-k+1)), where k = len(positions).'''
+    r = 0
+    for k, p in enumerate(positions):
+        r = r * (n - k) + p - sum(1 for q in positions[:k] if q < p)
+    return r
+
+def unrank(r, k, n):
+    '''Invert rank(): return the k distinct positions from range(n) with rank r.'''
+    digits = []
+    for base in range(n - k + 1, n + 1):
+        r, d = divmod(r, base)
+        digits.append(d)
+    free = list(range(n))
+    return tuple(free.pop(d) for d in reversed(digits))
+
+# Coordinate ranges: the twist of the last corner and the flip of the last edge are
+# implied by the others, and the slice coordinate counts the 4-of-12 positions of
+# the middle-layer edges FR, FL, BL, BR
+TWISTS = 3 ** 7
+FLIPS = 2 ** 11
+SLICES = comb(12, 4)
+CORNER_PERMS = 40320
+EDGE_PERMS = 479001600
+
+def twist(cube):
+    '''Corner orientation coordinate, 0..2186.'''
+    t = 0
+    for o in cube[1][:7]:
+        t = t * 3 + o
+    return t
+
+def flip(cube):
+    '''Edge orientation coordinate, 0..2047.'''
+    f = 0
+    for o in cube[3][:11]:
+        f = f * 2 + o
+    return f
+
+def slice_coordinate(cube):
+    '''Coordinate of the positions of the four middle-layer edges, 0..494.'''
+    positions = [i for i, edge in enumerate(cube[2]) if edge >= 8]
+    return sum(comb(p, k + 1) for k, p in enumerate(positions))
+
+def corner_perm(cube):
+    '''Corner permutation coordinate, 0..40319.'''
+    return rank(cube[0], 8)
+
+def edge_perm(cube):
+    '''Edge permutation coordinate, 0..479001599.'''
+    return rank(cube[2], 12)
+
+def twist_cube(t):
+    '''A cube with corner orientation coordinate t, otherwise solved.'''
+    co = []
+    for _ in range(7):
+        t, o = divmod(t, 3)
+        co.append(o)
+    co.reverse()
+    co.append(-sum(co) % 3)
+    return (SOLVED[0], tuple(co), SOLVED[2], SOLVED[3])
+
+def flip_cube(f):
+    '''A cube with edge orientation coordinate f, otherwise solved.'''
+    eo = []
+    for _ in range(11):
+        f, o = divmod(f, 2)
+        eo.append(o)
+    eo.reverse()
+    eo.append(sum(eo) % 2)
+    return (SOLVED[0], SOLVED[1], SOLVED[2], tuple(eo))
+
+def slice_cube(c):
+    '''A cube with slice coordinate c, otherwise solved.'''
+    positions = []
+    for k in range(4, 0, -1):
+        p = k - 1
+        while comb(p + 1, k) <= c:
+            p += 1
+        c -= comb(p, k)
+        positions.append(p)
+    slice_edges = iter(range(8, 12))
+    other_edges = iter(range(8))
+    ep = tuple(next(slice_edges) if i in positions else next(other_edges) for i in range(12))
+    return (SOLVED[0], SOLVED[1], ep, SOLVED[3])
+
+def corner_perm_cube(r):
+    '''A cube with corner permutation coordinate r, otherwise solved.'''
+    return (unrank(r, 8, 8), SOLVED[1], SOLVED[2], SOLVED[3])
+
+def move_table(size, make_cube, coordinate, moves):
+    '''Build the move table of a coordinate below 65536: entry c * len(moves) + m is
+    the coordinate after move m of a cube with coordinate c. make_cube(c) returns a
+    cube with coordinate c, and moves is a list of cubie-level moves.'''
+    table = array('H')
+    for c in range(size):
+        cube = make_cube(c)
+        for move in moves:
+            table.append(coordinate(multiply(cube, move)))
+    return table
+
+def parity(perm):
+    '''Return the parity of a permutation: 0 if it is even, 1 if it is odd.'''
+    seen = [False] * len(perm)
+    swaps = 0
+    for i in range(len(perm)):
+        # A cycle of length k takes k-1 swaps
+        length = 0
+        j = i
+        while not seen[j]:
+            seen[j] = True
+            j = perm[j]
+            length += 1
+        swaps += max(length - 1, 0)
+    return swaps % 2
+
+def validate(state):
+    '''Check that a 54-sticker state can be reached from the solved cube by face turns,
+    and return it as a cubie-level tuple. Raises ValueError, saying why, if the state
+    has the wrong number of squares of a color or two centers of one color, a corner
+    or edge that does not exist or appears twice, a twisted corner, a flipped edge, or
+    an odd permutation (two pieces swapped).'''
+    if len(state) != 54:
+        raise ValueError(f'a cube has 54 squares, not {len(state)}')
+    counts = [0] * 6
+    for color in state:
+        if color not in range(6):
+            raise ValueError(f'{color!r} is not a color 0-5')
+        counts[color] += 1
+    if counts != [9] * 6:
+        raise ValueError(f'every color needs 9 squares, found {counts}')
+    if len({state[4 + 9 * face] for face in range(6)}) != 6:
+        raise ValueError('two centers have the same color')
+
+    cube = from_stickers(state)
+    cp, co, ep, eo = cube
+    if len(set(cp)) != 8:
+        raise ValueError('a corner appears twice')
+    if len(set(ep)) != 12:
+        raise ValueError('an edge appears twice')
+    if sum(co) % 3:
+        raise ValueError('a corner is twisted')
+    if sum(eo) % 2:
+        raise ValueError('an edge is flipped')
+    if parity(cp) != parity(ep):
+        raise ValueError('two pieces are swapped (odd permutation)')
+    return cube
@@ -0,0 +1,259 @@
+# kociemba.py
+# Solve a 3x3 Rubik's cube with Kociemba's two-phase algorithm.
+#
+# Phase 1 turns the cube into the subgroup <U, D, R2, L2, F2, B2>, where all corners
+# and edges are oriented and the four middle-layer edges are in the middle layer.
+# Phase 2 solves the cube using only the moves of that subgroup. Both phases are
+# IDA* searches over small integer coordinates with move tables and pruning tables,
+# which are generated once and cached on disk.
+
+from array import array
+import os
+import time
+import cubie
+
+# Directory where the tables are cached, next to this module
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdb')
+
+# Moves are numbered 3 * face + power - 1 over the faces below, where a power of
+# 1, 2 or 3 is a clockwise quarter turn, a half turn or a counterclockwise turn
+FACES = 'UDLRBF'
+
+# Opposite faces share an axis: U-D, L-R and B-F
+AXIS = [0, 0, 1, 1, 2, 2]
+
+# Moves allowed in phase 2: quarter and half turns of U and D, half turns of the rest
+PHASE2_MOVES = [0, 1, 2, 3, 4, 5, 7, 10, 13, 16]
+
+# Coordinate ranges (see the coordinates in cubie.py)
+TWISTS = cubie.TWISTS  # corner orientations
+FLIPS = cubie.FLIPS  # edge orientations
+SLICES = cubie.SLICES  # positions of the four middle-layer edges
+CORNER_PERMS = cubie.CORNER_PERMS  # corner permutations
+EDGE8_PERMS = 40320  # permutations of the eight U/D-layer edges in phase 2
+SLICE_PERMS = 24  # permutations of the four middle-layer edges in phase 2
+
+# Phase 2 is first tried only up to this depth: a long phase 2 costs far more than
+# trying other phase-1 solutions, most of which need fewer phase-2 moves
+PHASE2_DEPTH = 12
+
+# Slice coordinate of the solved cube (middle-layer edges in positions 8-11)
+SLICE_SOLVED = SLICES - 1
+
+# Loaded tables, filled in by load()
+_TABLES = {}
+
+def _cubie_moves():
+    '''Return the 18 cubie-level moves in move-number order.'''
+    return [cubie.MOVES[face, direction] for face in FACES for direction in ('CW', '180', 'CCW')]
+
+def edge8_perm(cube):
+    '''Permutation coordinate of the U/D-layer edges, 0..40319 (phase 2 only).'''
+    return cubie.rank(cube[2][:8], 8)
+
+def slice_perm(cube):
+    '''Permutation coordinate of the middle-layer edges, 0..23 (phase 2 only).'''
+    return cubie.rank([edge - 8 for edge in cube[2][8:]], 4)
+
+def _perm_cube(r, edges8=False, slice_edges=False):
+    '''A cube whose U/D-edge or middle-edge permutation has rank r.'''
+    cp, ep = cubie.SOLVED[0], list(cubie.SOLVED[2])
+    if edges8:
+        ep[:8] = cubie.unrank(r, 8, 8)
+    if slice_edges:
+        ep[8:] = [edge + 8 for edge in cubie.unrank(r, 4, 4)]
+    return (cp, cubie.SOLVED[1], tuple(ep), cubie.SOLVED[3])
+
+def _pruning_table(size1, table1, size2, table2, moves, solved1=0):
+    '''Breadth-first search over the pair coordinate c1 * size2 + c2, starting from
+    the solved pair (solved1, 0). Returns the number of moves needed to solve each pair.'''
+    n = len(moves)
+    solved = solved1 * size2
+    distances = bytearray(b'\xff') * (size1 * size2)
+    distances[solved] = 0
+    frontier = [solved]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for index in frontier:
+            c1, c2 = divmod(index, size2)
+            for m in moves:
+                child = table1[c1 * n + m] * size2 + table2[c2 * n + m]
+                if distances[child] == 255:
+                    distances[child] = depth
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return distances
+
+def build():
+    '''Generate all move and pruning tables. Takes about a minute.'''
+    moves = _cubie_moves()
+    phase2 = [moves[m] for m in PHASE2_MOVES]
+    tables = {
+        'twist': cubie.move_table(TWISTS, cubie.twist_cube, cubie.twist, moves),
+        'flip': cubie.move_table(FLIPS, cubie.flip_cube, cubie.flip, moves),
+        'slice': cubie.move_table(SLICES, cubie.slice_cube, cubie.slice_coordinate, moves),
+        'corners': cubie.move_table(CORNER_PERMS, cubie.corner_perm_cube, cubie.corner_perm, phase2),
+        'edges8': cubie.move_table(EDGE8_PERMS, lambda r: _perm_cube(r, edges8=True), edge8_perm, phase2),
+        'slice_perm': cubie.move_table(SLICE_PERMS, lambda r: _perm_cube(r, slice_edges=True), slice_perm, phase2),
+    }
+    all_moves = range(len(moves))
+    phase2_moves = range(len(phase2))
+    tables['slice_twist'] = _pruning_table(SLICES, tables['slice'], TWISTS, tables['twist'], all_moves, SLICE_SOLVED)
+    tables['slice_flip'] = _pruning_table(SLICES, tables['slice'], FLIPS, tables['flip'], all_moves, SLICE_SOLVED)
+    tables['slice_corners'] = _pruning_table(SLICE_PERMS, tables['slice_perm'], CORNER_PERMS, tables['corners'], phase2_moves)
+    tables['slice_edges8'] = _pruning_table(SLICE_PERMS, tables['slice_perm'], EDGE8_PERMS, tables['edges8'], phase2_moves)
+    return tables
+
+def load(directory=DIRECTORY):
+    '''Load the cached tables, generating and caching them on first use.'''
+    if _TABLES:
+        return _TABLES
+    path = os.path.join(directory, 'kociemba.tables')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            while True:
+                header = f.readline()
+                if not header:
+                    break
+                name, typecode, length = header.decode().split()
+                if typecode == 'B':
+                    table = bytearray(f.read(int(length)))
+                else:
+                    table = array(typecode)
+                    table.fromfile(f, int(length))
+                _TABLES[name] = table
+    else:
+        print('Generating two-phase solver tables...')
+        _TABLES.update(build())
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            for name, table in _TABLES.items():
+                typecode = table.typecode if isinstance(table, array) else 'B'
+                f.write(f'{name} {typecode} {len(table)}\n'.encode())
+                if typecode == 'B':
+                    f.write(table)
+                else:
+                    table.tofile(f)
+    return _TABLES
+
+def _to_actions(moves):
+    '''Convert move numbers to [face, direction] actions as used by rubiks.printSolution.'''
+    return [[FACES[m // 3], ['CW', '180', 'CCW'][m % 3]] for m in moves]
+
+def solve(state, max_length=30, timeout=0.5, stats=None):
+    '''Solve a 54-sticker cube state and return the solution as [face, direction] actions.
+    Solutions are limited to max_length moves, counting half turns as one move. After
+    the first solution is found, shorter ones are searched for until timeout seconds
+    have passed since the start, and the shortest is returned. Returns None if there
+    is no solution within max_length moves. If a stats dict is given, stats['nodes']
+    gets the number of nodes searched in both phases.'''
+    tables = load()
+    twist_move, flip_move, slice_move = tables['twist'], tables['flip'], tables['slice']
+    corner_move, edge8_move, slice_perm_move = tables['corners'], tables['edges8'], tables['slice_perm']
+    slice_twist, slice_flip = tables['slice_twist'], tables['slice_flip']
+    slice_corners, slice_edges8 = tables['slice_corners'], tables['slice_edges8']
+    moves = _cubie_moves()
+    n1, n2 = len(moves), len(PHASE2_MOVES)
+
+    # Moves worth trying after a turn of each face (index 6: no previous move). A
+    # face is never turned twice in a row, and opposite faces go in one order only.
+    def allowed(face, last):
+        return last == 6 or not (face == last or (AXIS[face] == AXIS[last] and face < last))
+    after1 = [[m for m in range(n1) if allowed(m // 3, last)] for last in range(7)]
+    after2 = [[(i, m) for i, m in enumerate(PHASE2_MOVES) if allowed(m // 3, last)] for last in range(7)]
+
+    start = cubie.from_stickers(state)
+    deadline = time.time() + timeout
+    best = None
+    path = []
+    nodes = 0
+
+    def phase2(corners, edges8, slice_p, togo, last):
+        '''Depth-limited search for a phase-2 solution of exactly togo moves. A move
+        passes the pruning tables with one move to go only if it solves the cube.'''
+        nonlocal nodes
+        if best is not None and time.time() > deadline:
+            return False
+        for i, m in after2[last]:
+            s = slice_perm_move[slice_p * n2 + i]
+            c = corner_move[corners * n2 + i]
+            if slice_corners[s * CORNER_PERMS + c] >= togo:
+                continue
+            e = edge8_move[edges8 * n2 + i]
+            if slice_edges8[s * EDGE8_PERMS + e] >= togo:
+                continue
+            nodes += 1
+            path.append(m)
+            if togo == 1 or phase2(c, e, s, togo - 1, m // 3):
+                return True
+            path.pop()
+        return False
+
+    def start_phase2():
+        '''Run phase 2 from the end of the current phase-1 path, keeping the result if
+        the total is shorter than the best solution so far.'''
+        nonlocal best
+        cube = start
+        for m in path:
+            cube = cubie.multiply(cube, moves[m])
+        corners, edges8, slice_p = cubie.corner_perm(cube), edge8_perm(cube), slice_perm(cube)
+        limit = min(len(best) if best is not None else max_length + 1, len(path) + phase2_depth + 1) - len(path)
+        h = max(slice_corners[slice_p * CORNER_PERMS + corners], slice_edges8[slice_p * EDGE8_PERMS + edges8])
+        length1 = len(path)
+        if h == 0:
+            best = path.copy()
+            return
+        for togo in range(h, limit):
+            if phase2(corners, edges8, slice_p, togo, path[-1] // 3 if path else 6):
+                best = path.copy()
+                del path[length1:]
+                return
+        del path[length1:]
+
+    def phase1(tw, fl, sl, togo, last):
+        '''Depth-limited search for phase-1 solutions of exactly togo moves, each of which
+        is handed to phase 2. Returns True when the search should stop.'''
+        nonlocal nodes
+        for m in after1[last]:
+            t = twist_move[tw * n1 + m]
+            s = slice_move[sl * n1 + m]
+            if slice_twist[s * TWISTS + t] >= togo:
+                continue
+            f = flip_move[fl * n1 + m]
+            if slice_flip[s * FLIPS + f] >= togo:
+                continue
+            nodes += 1
+            path.append(m)
+            if togo == 1:
+                # A phase-1 solution ending in a phase-2 move is found one move shorter
+                if m not in PHASE2_MOVES:
+                    start_phase2()
+                stop = best is not None and time.time() > deadline
+            else:
+                stop = phase1(t, f, s, togo - 1, m // 3)
+            path.pop()
+            if stop:
+                return True
+        return False
+
+    # Deepen Phase 1 Until a Solution is Found and Time Runs Out, Lifting the
+    # Phase-2 Depth Limit if No Solution Fits Under it
+    tw, fl, sl = cubie.twist(start), cubie.flip(start), cubie.slice_coordinate(start)
+    for phase2_depth in [PHASE2_DEPTH, max_length]:
+        if tw == 0 and fl == 0 and sl == SLICE_SOLVED:
+            start_phase2()
+        depth = max(1, slice_twist[sl * TWISTS + tw], slice_flip[sl * FLIPS + fl])
+        while depth <= max_length:
+            if best is not None and (depth >= len(best) or time.time() > deadline):
+                break
+            if phase1(tw, fl, sl, depth, 6):
+                break
+            depth += 1
+        if best is not None:
+            break
+
+    if stats is not None:
+        stats['nodes'] = nodes
+    return _to_actions(best) if best is not None else None
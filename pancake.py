@@ -2,16 +2,17 @@
 # Flipping pancakes with greedy best-first search (GBFS).
 
 import argparse
-from graphics import *
-from matplotlib import cm
+from heapq import heappop, heappush
+from itertools import count
 import pdb
-from queue import PriorityQueue
 import random
 import time
 
 parser = argparse.ArgumentParser(description="Use greedy best-first search (GBFS) to optimally flip a stack of pancakes")
 parser.add_argument('-n', '--num', metavar='pancakes', type=int, help="number of pancakes", default=8)
 parser.add_argument('--seed', type=int, help="seed for randomly arranging pancakes initially")
+parser.add_argument('--weight', type=float, help="order the search by g + weight*h (weighted A*) instead of h alone")
+parser.add_argument('--time-budget', type=float, help="seconds after which the search gives up")
 
 def main(args):
     # Parse inputs
@@ -33,14 +34,19 @@ def main(args):
             elif key == 'd':  # debug the program
                 pdb.set_trace()
             elif key == 'g':  # run greedy best-first search
-                path = gbfs(gui, stack)
+                status = gui.items[-1]
+                path = gbfs(gui, stack, callback=lambda stats: status.setText("GBFS: " + format_stats(stats)),
+                            weight=args.weight, time_budget=args.time_budget)
             elif key in [str(i) for i in range(1, n + 1)]:  # manually flip some of the pancakes
                 flip(gui, stack, int(key))
 
     gui.close()
 
 def guisetup(stack):
-    '''Create graphical user interface for a stack of n pancakes.'''
+    '''Create graphical user interface for a stack of n pancakes.
+    The graphics module (and Tk) and matplotlib are only loaded here, so gbfs runs headless.'''
+    from graphics import GraphWin, Line, Point, Text, color_rgb
+    from matplotlib import cm
     n = len(stack)  # number of pancakes in the stack
     thickness = 12  # thickness of each pancake, in pixels
     margin = 40 # Space between wall and pancake on each side
@@ -166,89 +172,167 @@ def cost(stack):
     # Return Cost
     return h
 
-def gbfs(gui, stack):
-    '''Run greedy best-first search on a stack of pancakes and return the solution path.'''
+def gbfs(gui, stack, stats=None, callback=None, interval=1.0, weight=None, time_budget=None):
+    '''Run greedy best-first search on a stack of pancakes and return the solution path.
+    gui may be None to search without a window. If a stats dict is given, it is filled
+    in as described in new_stats(), and callback(stats) is called about every interval
+    seconds while the search runs. With a weight, nodes are ordered by g + weight*h
+    (weighted A*) instead of h alone, giving shorter solutions for more nodes searched.
+    The search gives up after time_budget seconds, if given.'''
     print("Running greedy best-first search...")
 
-    # Get graphics objects from GUI
-    obj = gui.items
-    pancakes = obj[:-2]
-    status = obj[-1]
-
     # Update status text on GUI
-    status.setText(f"Running greedy best-first search...")
+    if gui:
+        status = gui.items[-1]
+        status.setText(f"Running greedy best-first search...")
    
-    # Count # of Iterations / Paths Searched
+    # Count # of Iterations / Paths Searched, and Initialize Statistics
     cnt = 0
+    stats = new_stats(stats)
+    start = time.perf_counter()
+    next_report = start + interval
     
     # Initialze Desired Solution Path to Compares States to
     desired_solution = list(range(len(stack))) # [0, 1, 2, 3, 4, 5, ..., n-1]
     
-    # Initialize Priority Queue
-    pq = PriorityQueue()
+    # Initialize Open List (a Binary Heap) of (Cost, g, Tie, Node) Entries: Ties Go to the
+    # Shallower Node, then to the Newest (a Counter Pushed Negated), so the Search Dives from
+    # the Latest Stack Instead of Sweeping a Whole Plateau of Equal Cost
+    pq = []
+    tie = count()
     
     # Initialize Cost to Nodes
     cost_to_node = {}
     
-    # Add Starting State to Priority Queue
-    pq.put((cost(stack), '', stack))
+    # Initialize Node Table: Each Node Stores Only its Parent, the Flip that Reached it,
+    # its g and its Stack, so the Path is Rebuilt Once at the Goal
+    parents = [-1]
+    flips = [None]
+    depths = [0]
+    stacks = [stack]
+
+    # Add Starting Node to Open List
+    heappush(pq, (cost(stack) if weight is None else weight * cost(stack), 0, -next(tie), 0))
     
     # Add Starting State to List of Visited Nodes (Cost)
-    cost_to_node.update({" ".join(map(str, stack)) : cost(stack)})
+    cost_to_node[" ".join(map(str, stack))] = cost(stack)
     
-    # Loop Until Solution Found
-    while True:
-        
-        # If Queue is Empty, Return Failure
-        if pq.qsize == 0:
-            solution = "None found... :("
-            break
+    # Loop Until Solution Found or Open List is Empty
+    solution_path = None
+    while pq:
         
-        # Pop Front Node (Stack) from PQ
-        front = pq.get()
+        # Pop Front Node from Open List
+        front_cost, _, _, front = heappop(pq)
+        front_stack = stacks[front]
         
         # Increment Count
         cnt += 1
+        stats['f'] = front_cost
+        stats['h'] = min(stats['h'], front_cost if weight is None else (front_cost - depths[front]) / weight)
+
+        # Report Progress Every Interval Seconds, and Stop Once the Time Budget is Spent
+        if cnt % 256 == 0 and (callback or time_budget is not None):
+            now = time.perf_counter()
+            if time_budget is not None and now - start > time_budget:
+                print(f'time budget of {time_budget} s spent')
+                break
+            if callback and now >= next_report:
+                update_stats(stats, cnt, len(pq), len(cost_to_node), start)
+                callback(stats)
+                next_report = time.perf_counter() + interval
         
         # Check if Popped Node Contains Goal
-        if front[2] == desired_solution:
+        if front_stack == desired_solution:
+            solution_path = trace_path(parents, flips, front)
+            stats['length'] = depths[front]
             break
             
         # Start Expanding from Front with Each Available Action (# of Pancakes Flipped)
         for flip in range(2, len(stack) + 1):
             
-            # Update List/String of Flip Actions
-            node = front[1]
-            node += str(flip)
-            
             # Determine Child Node (Returns Updated Stack)
-            child = simulate(front[2], flip)
+            timer = time.perf_counter()
+            child = simulate(front_stack, flip)
+            stats['generated'] += 1
                     
             # Lists (Stacks) cannot be Elements of a Dictionary, so Convert the Lists to Strings
             child_str = " ".join(map(str, child))
             
             # Determine Cost of Child Node
-            child_cost = cost(child)
+            moved = time.perf_counter()
+            child_cost = cost(child) if weight is None else depths[front] + 1 + weight * cost(child)
+            stats['move_time'] += moved - timer
+            stats['heuristic_time'] += time.perf_counter() - moved
             
-            # Only Add Node to PQ if Child has NOT been Visited
-            if cost_to_node.get(child_str) == None:
-                # Add Child to PQ
-                pq.put((child_cost, node, child))
+            # Only Add Node to Open List if Child has NOT been Visited
+            if child_str not in cost_to_node:
+                # Add Child to Node Table and Open List
+                parents.append(front)
+                flips.append(flip)
+                depths.append(depths[front] + 1)
+                stacks.append(child)
+                heappush(pq, (child_cost, depths[-1], -next(tie), len(stacks) - 1))
                 # Update Cost
-                cost_to_node.update({child_str : child_cost})
+                cost_to_node[child_str] = child_cost
+            else:
+                stats['duplicates'] += 1
     
     # ------------------------------------
     
-    # Initialize Solution Path
-    solution_path = front[1]
+    # If Open List Ran Empty, Return Failure
+    if solution_path is None:
+        solution_path = "None found... :("
 
+    update_stats(stats, cnt, len(pq), len(cost_to_node), start)
+    if callback:
+        callback(stats)
     print(f'searched {cnt} paths')
     print(f'solution: {solution_path}')
-    status.setText("...search is complete")
+    if gui:
+        status.setText("...search is complete")
     
     # Return Solution Path
     return solution_path
 
+def new_stats(stats=None):
+    '''Reset a search statistics dict (or make a new one) and return it. The keys are:
+    generated and expanded: nodes generated and expanded (popped) so far,
+    duplicates: children dropped because their stack was already reached,
+    reopened: always 0, as GBFS never reopens a stack,
+    open and closed: the number of entries in the open list and of stacks visited,
+    f and h: the cost of the last node expanded and the smallest h expanded so far
+    (the same unless a weight is given, as GBFS orders nodes by h alone),
+    move_time and heuristic_time: seconds spent flipping and computing costs,
+    elapsed: seconds since the search started,
+    length: the number of flips of the solution found (None until one is found),
+    nodes: the nodes searched, as printed when the search ends (the nodes expanded).'''
+    stats = {} if stats is None else stats
+    stats.update(generated=0, expanded=0, duplicates=0, reopened=0, open=0, closed=0,
+                 f=0, h=float('inf'), move_time=0.0, heuristic_time=0.0, elapsed=0.0,
+                 length=None, nodes=0)
+    return stats
+
+def update_stats(stats, expanded, open_size, closed_size, start):
+    '''Bring the counts of a search statistics dict that a search keeps elsewhere up to
+    date: nodes expanded, open and closed list sizes and the time since start.'''
+    stats['expanded'] = stats['nodes'] = expanded
+    stats['open'] = open_size
+    stats['closed'] = closed_size
+    stats['elapsed'] = time.perf_counter() - start
+
+def format_stats(stats):
+    '''Format search statistics as one line, for logs and status text.'''
+    return (f"expanded {stats['expanded']}, generated {stats['generated']}, open {stats['open']}, "
+            f"closed {stats['closed']}, best h {stats['h']}, {stats['elapsed']:.1f} s")
+
+def trace_path(parents, flips, node):
+    '''Rebuild the string of flip actions leading to a node of the node table.'''
+    path = []
+    while parents[node] != -1:
+        path.append(str(flips[node]))
+        node = parents[node]
+    return ''.join(reversed(path))
+
 def simulate(stack, path):
     '''Simulate the flipping of pancakes to determine the resulting stack.'''
     # Reverse Fake Stack, as This Code Flips the Opposite End
@@ -0,0 +1,172 @@
+# pattern_db.py
+# Pattern-database heuristics for the Rubik's cube.
+#
+# Each database stores, for every arrangement of a subset of the cubies, the exact
+# number of quarter turns needed to solve that subset. The tables are built once by
+# a backward breadth-first search from the solved cube, saved to disk with 4 bits
+# per entry and memory-mapped when loaded, so a solver starts without rebuilding.
+# Building the corner table takes hours in pure Python: run this file once.
+
+import argparse
+from array import array
+import mmap
+import os
+import cubie
+
+parser = argparse.ArgumentParser(description="Build the Rubik's cube pattern databases")
+parser.add_argument('-d', '--directory', help="directory to write the databases to")
+
+# Default directory for the database files, next to this module
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdb')
+
+# Number of corner orientation coordinates: the twist of the last corner is implied
+TWISTS = cubie.TWISTS
+
+# Size of the corner database: 8! permutations times 3^7 orientations
+CORNER_SIZE = cubie.CORNER_PERMS * TWISTS
+
+# The two 6-edge subsets that get a database each
+EDGE_GROUPS = [(0, 1, 2, 3, 4, 5), (6, 7, 8, 9, 10, 11)]
+
+# Marks an entry that the breadth-first search has not reached yet
+UNSEEN = 15
+
+# Loaded databases as (name, table, index function), filled in by load()
+_TABLES = []
+
+def corner_index(cube):
+    '''Index of the corner permutation and orientation of a cubie-level cube.'''
+    return cubie.corner_perm(cube) * TWISTS + cubie.twist(cube)
+
+def edge_size(edges):
+    '''Number of entries of the database for a subset of the edges.'''
+    size = 2 ** len(edges)
+    for k in range(len(edges)):
+        size *= 12 - k
+    return size
+
+def edge_index(cube, edges):
+    '''Index of the positions and flips of a subset of the edges of a cubie-level cube.'''
+    ep, eo = cube[2], cube[3]
+    positions = [ep.index(edge) for edge in edges]
+    flips = 0
+    for k, p in enumerate(positions):
+        flips |= eo[p] << k
+    return cubie.rank(positions, 12) * 2 ** len(edges) + flips
+
+def _quarter_turns():
+    '''Return the cubie-level tables of the 12 quarter turns: the databases count
+    quarter turns.'''
+    return [move for (_, direction), move in cubie.MOVES.items() if direction != '180']
+
+def _corner_children():
+    '''Return a function listing the corner indices one quarter turn away from an index.'''
+    moves = _quarter_turns()
+
+    # Move tables for the permutation rank and the orientation coordinate
+    perm_table = cubie.move_table(cubie.CORNER_PERMS, cubie.corner_perm_cube, cubie.corner_perm, moves)
+    twist_table = cubie.move_table(TWISTS, cubie.twist_cube, cubie.twist, moves)
+
+    n = len(moves)
+    def children(index):
+        r, t = divmod(index, TWISTS)
+        return [perm_table[r * n + m] * TWISTS + twist_table[t * n + m] for m in range(n)]
+    return children
+
+def _edge_children(edges):
+    '''Return a function listing the edge-subset indices one quarter turn away from an index.'''
+    moves = _quarter_turns()
+    k = len(edges)
+    flip_count = 2 ** k
+
+    # Where each position goes under each move, and whether the edge flips on the way
+    destinations = [[mep.index(p) for p in range(12)] for _, _, mep, _ in moves]
+
+    # Move tables for the position rank and the flips that each move applies
+    perm_table = array('I')
+    flip_table = bytearray()
+    for r in range(edge_size(edges) // flip_count):
+        positions = cubie.unrank(r, k, 12)
+        for dest, (_, _, _, meo) in zip(destinations, moves):
+            moved = [dest[p] for p in positions]
+            perm_table.append(cubie.rank(moved, 12))
+            flip_table.append(sum(meo[p] << j for j, p in enumerate(moved)))
+
+    n = len(moves)
+    def children(index):
+        r, flips = divmod(index, flip_count)
+        return [perm_table[r * n + m] * flip_count + (flips ^ flip_table[r * n + m]) for m in range(n)]
+    return children
+
+def build(size, start, children, verbose=True):
+    '''Breadth-first search from the start index over all size indices.
+    Returns a bytearray holding the distance of every index in 4 bits.'''
+    table = bytearray(b'\xff') * ((size + 1) // 2)
+    table[start >> 1] &= ~(15 << ((start & 1) << 2)) & 255
+    frontier = array('I', [start])
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = array('I')
+        for index in frontier:
+            for child in children(index):
+                shift = (child & 1) << 2
+                if (table[child >> 1] >> shift) & 15 == UNSEEN:
+                    if depth >= UNSEEN:
+                        raise ValueError(f'distances of {depth} do not fit in 4 bits')
+                    table[child >> 1] ^= (UNSEEN ^ depth) << shift
+                    next_frontier.append(child)
+        frontier = next_frontier
+        if verbose:
+            print(f'depth {depth}: {len(frontier)} states')
+    return table
+
+def build_all(directory=DIRECTORY):
+    '''Build the corner database and one database per edge group and save them.'''
+    os.makedirs(directory, exist_ok=True)
+    print('Building corner pattern database...')
+    table = build(CORNER_SIZE, corner_index(cubie.SOLVED), _corner_children())
+    save(table, os.path.join(directory, 'corners.pdb'))
+    for group, edges in enumerate(EDGE_GROUPS):
+        print(f'Building edge pattern database for edges {edges}...')
+        table = build(edge_size(edges), edge_index(cubie.SOLVED, edges), _edge_children(edges))
+        save(table, os.path.join(directory, f'edges{group}.pdb'))
+
+def save(table, path):
+    '''Write a database to a file.'''
+    with open(path, 'wb') as f:
+        f.write(table)
+
+def open_table(path, size):
+    '''Memory-map a database file read-only, checking that it has the expected size.'''
+    with open(path, 'rb') as f:
+        table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(table) != (size + 1) // 2:
+        raise ValueError(f'{path} has {len(table)} bytes, expected {(size + 1) // 2}')
+    return table
+
+def load(directory=DIRECTORY):
+    '''Memory-map the corner and edge databases saved by build_all().'''
+    if _TABLES:
+        return
+    tables = [('corners', open_table(os.path.join(directory, 'corners.pdb'), CORNER_SIZE), corner_index)]
+    for group, edges in enumerate(EDGE_GROUPS):
+        path = os.path.join(directory, f'edges{group}.pdb')
+        tables.append((f'edges{group}', open_table(path, edge_size(edges)),
+                       lambda cube, edges=edges: edge_index(cube, edges)))
+    _TABLES.extend(tables)
+
+def lookup(table, index):
+    '''Read the 4-bit distance stored at an index of a database.'''
+    return (table[index >> 1] >> ((index & 1) << 2)) & 15
+
+def heuristic(state):
+    '''Compute h for a 54-sticker cube state: the largest distance stored for it in
+    the corner and edge databases. Never overestimates the quarter-turn distance.'''
+    load()
+    cube = cubie.from_stickers(state)
+    return max(lookup(table, index(cube)) for _, table, index in _TABLES)
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    build_all(args.directory or DIRECTORY)
@@ -2,15 +2,65 @@
 # Solve a 3x3 Rubik's cube using A* search.
 
 import argparse
-from graphics import *
+from contextlib import redirect_stdout
+import cubie
+import glob
+from heapq import heappop, heappush, nsmallest
+from itertools import count, permutations, product
+import io
+import json
+import kociemba
+from multiprocessing import Array, Lock, Pool, Process, Queue, Value
+from operator import itemgetter, ne
+import os
+import pattern_db
 import pdb
-from queue import PriorityQueue
+from queue import Empty
+import resource
+import sqlite3
+import sys
+import time
 
 parser = argparse.ArgumentParser(description="Solving a Rubik's Cube with A* Search")
 parser.add_argument('-s', '--state', help="text file containing initial state of the cube, encoded as a sequence of integers")
+parser.add_argument('-n', '--size', type=int, choices=range(2, 8), default=3, metavar='N', help="number of squares per row of the cube, 2 to 7 (default: 3)")
+parser.add_argument('--heuristic', choices=['stickers', 'pdb'], default='stickers', help="heuristic used by the solvers: misplaced stickers, or the pattern databases built by pattern_db.py")
+parser.add_argument('--metric', choices=['quarter', 'half'], default='quarter', help="moves the solvers may use: quarter turns only, or half turns as single moves too")
+parser.add_argument('--macro', action='append', default=[], metavar='NAME=MOVES', help="add a macro move made of a sequence of moves, e.g. sexy=\"R, U, Shift+R, Shift+U\" (may be repeated)")
+parser.add_argument('--batch', metavar='PATH', help="solve every state file in a directory or matching a glob pattern without opening a window, writing one JSON line per state")
+parser.add_argument('--solver', choices=['astar', 'anytime', 'idastar', 'bidirectional', 'twophase', 'beam'], default='astar', help="solver used in batch mode")
+parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="number of worker processes in batch mode (default: one per core)")
+parser.add_argument('-o', '--output', help="file to write the batch results to (default: standard output)")
+parser.add_argument('--weight', type=float, default=1.0, help="weight w of the heuristic in A* (f = g + w*h); above 1 trades solution length for speed")
+parser.add_argument('--time-budget', type=float, help="seconds after which A* gives up, and anytime A* returns its best solution so far (default: no limit for A*, 10 s for anytime A*)")
+parser.add_argument('--max-nodes', type=int, help="cap on the nodes A* keeps in memory; over it, A* keeps only the best --beam-width open nodes and may return a longer solution")
+parser.add_argument('--beam-width', type=int, default=1000, help="open nodes A* keeps when it goes over --max-nodes")
+parser.add_argument('--cache', metavar='FILE', help="SQLite file of known solutions: looked up before every search, and optimal solutions are added to it")
 
 
 def main(args):
+    # Switch to the Cube Size Asked for; Some Solvers Only Know the 3x3x3 Cube
+    set_size(args.size)
+    if args.size != 3 and (args.heuristic == 'pdb' or args.solver == 'twophase' or args.cache):
+        parser.error('--heuristic pdb, --solver twophase and --cache need a 3x3x3 cube')
+    if args.max_nodes is not None and args.beam_width >= args.max_nodes:
+        parser.error('--beam-width must be smaller than --max-nodes')
+
+    # Define the Macro Moves, Refusing Malformed Ones Before any Search or Batch Starts
+    for macro in args.macro:
+        name, equals, sequence = macro.partition('=')
+        if not equals or not name.strip():
+            parser.error(f'--macro {macro!r} is not of the form NAME=MOVES')
+        try:
+            define_macro(name.strip(), parse_moves(sequence))
+        except ValueError as e:
+            parser.error(f'--macro {macro!r}: {e}')
+
+    # Solve a Batch of State Files Without a Window
+    if args.batch:
+        batch(args)
+        return
+
     # Initialize dictionary of parameters
     params = {
         'colors': ["#b71234",
@@ -19,7 +69,7 @@ def main(args):
                    "#009b48",
                    "#ffd500",
                    "#ff5800"],
-        'n': 3,
+        'n': args.size,
         'pixels': 45,
         'thickness': 4}
 
@@ -29,24 +79,24 @@ def main(args):
     # cube, but rather the colors of the initial state.
     # ***MODIFY CODE HERE*** (7 lines)
     current_state = []
-    # if the user provided a --state file in args
+    # if the user provided a --state file in args, read it, refusing a file that
+    # does not hold a state that some sequence of turns can solve
     if args.state:
-        # the provided file is this
-        state_file = args.state
-        # open the provided file
-        f = open(state_file, "r")
-        # read the file (it will be a String of numbers)
-        state_str = f.readline()
-        # close the file
-        f.close()
-        # convert the String into a list of ints
-        for i in state_str:
-            current_state.append(int(i))
+        try:
+            current_state = read_state(args.state)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
     # if the user DID NOT provide a --state file
     else:
         # set current_state to default (the sovled cube)
         for i in range(6):
-            current_state += [i] * 3 ** 2
+            current_state += [i] * SIZE ** 2
+
+    # Choose the heuristic used by the solvers
+    h = pattern_db.heuristic if args.heuristic == 'pdb' else heuristic
+
+    # Build the move set used by the solvers, with any macro moves
+    moveset = build_moveset(args.metric, MACROS)
 
     # ***DO NOT MODIFY THE FOLLOWING 2 LINES***
     initial_state = current_state.copy()  # for resetting the cube
@@ -56,9 +106,33 @@ def main(args):
     gui = guisetup(params)
     recolor(gui, current_state, params)  # in case the initial state is mixed
 
+    # Searches run in a background process (job), so the window stays responsive;
+    # the last solution found (path) can be played back on the state it solves
+    job = None
+    path = None
+    solved_from = None
+
+    # Layer turned by the next face key, counted from that face (a digit key sets it)
+    layer = 1
+
     # Wait for user interaction
     while True:
         key = gui.checkKey()
+
+        # Show the Progress of a Background Search, and Pick up its Solution
+        if job is not None:
+            done, solution = poll_solve(job, gui.items[-1])
+            if done:
+                job = None
+                if solution is not None:
+                    path, solved_from = solution, job_state
+                    gui.items[-1].setText(f"Solved in {len(path)} moves: press Return to play back")
+                else:
+                    gui.items[-1].setText("No solution found")
+            elif not key:
+                time.sleep(0.02)
+
+        request = None
         if key:
             # print(current_state)
             if key == "Escape":  # quit the program
@@ -80,11 +154,16 @@ def main(args):
                 current_state = previous_state.copy()
                 recolor(gui, current_state, params)
 
+            elif key.isdigit() and 2 <= int(key) <= args.size:
+                # Turn an inner layer with the next face key: 2 is the layer next to the face
+                layer = int(key)
+                gui.items[-1].setText(f"Press U/D/L/R/B/F to turn layer {layer} from that face")
+
             elif key.upper() in 'UDLRBF':
                 # Rotate one of the cube faces clockwise
                 previous_state = current_state.copy()
-                face = key.upper()
-                direction = 'CW'
+                face, direction = layer_move(key.upper(), layer, 'CW')
+                layer = 1
                 print("Rotating", face, "face", direction)
                 txt = gui.items[-1]
                 txt.setText("Rotating " + face + " face " + direction)
@@ -94,8 +173,8 @@ def main(args):
             elif key[:6] == 'Shift+' and key[6].upper() in 'UDLRBF':
                 # Rotate one of the cube faces counterclockwise
                 previous_state = current_state.copy()
-                face = key[6].upper()
-                direction = 'CCW'
+                face, direction = layer_move(key[6].upper(), layer, 'CCW')
+                layer = 1
                 print("Rotating", face, "face", direction)
                 txt = gui.items[-1]
                 txt.setText("Rotating " + face + " face " + direction)
@@ -104,114 +183,1057 @@ def main(args):
 
             elif key == 'a':
                 # Solve the cube using A* search
-                path = astar(current_state)
+                request = ('A*', astar, is_exact(astar, h, args.metric, args.macro) and args.weight == 1
+                           and args.max_nodes is None,
+                           dict(heuristic=h, moveset=moveset, weight=args.weight, time_budget=args.time_budget,
+                                max_nodes=args.max_nodes, beam_width=args.beam_width))
+
+            elif key == 'w':
+                # Solve the cube using anytime weighted A* search, within the time budget
+                request = ('Anytime A*', anytime_astar, False,
+                           dict(heuristic=h, moveset=moveset, weight=args.weight if args.weight > 1 else 3.0,
+                                time_budget=args.time_budget or 10.0))
+
+            elif key == 'i':
+                # Solve the cube using IDA* search
+                request = ('IDA*', idastar, is_exact(idastar, h, args.metric, args.macro),
+                           dict(heuristic=h, moveset=moveset))
+
+            elif key == 'Shift+A':
+                # Solve the cube using A* search spread over all cores
+                request = ('HDA*', hdastar, is_exact(hdastar, h, args.metric, args.macro),
+                           dict(heuristic=h, moveset=moveset))
+
+            elif key == 'e':
+                # Solve the cube using beam search over NumPy blocks
+                request = ('Beam search', beam_search, False, dict(moveset=moveset))
+
+            elif key == 'k':
+                # Solve the cube using the two-phase algorithm
+                if args.size != 3:
+                    gui.items[-1].setText("The two-phase solver only solves the 3x3x3 cube")
+                else:
+                    request = ('Two-phase', twophase, False, {})
+
+            elif key == 'm':
+                # Solve the cube using bidirectional (meet-in-the-middle) search
+                request = ('Bidirectional search', bidirectional, is_exact(bidirectional, h, args.metric, args.macro),
+                           dict(moveset=moveset))
+
+            elif key == 'c':
+                # Cancel the search running in the background
+                if job is not None:
+                    job['process'].terminate()
+                    job['process'].join()
+                    job = None
+                    print('Search cancelled')
+                    gui.items[-1].setText("Search cancelled")
+
+            elif key == 'Return':
+                # Play back the solution found by the last search
+                if path is None:
+                    gui.items[-1].setText("No solution to play back: press a to solve")
+                elif current_state != solved_from:
+                    gui.items[-1].setText("The cube has changed since the search: solve it again")
+                else:
+                    previous_state = current_state.copy()
+                    for face, direction in path:
+                        gui.items[-1].setText("Rotating " + face + " face " + direction)
+                        rotate(current_state, face, direction)
+                        recolor(gui, current_state, params)
+                        time.sleep(0.3)
+                    path = None
 
             elif key == 'h':
                 # Print the current heuristic cost
                 print(f"Current heuristic cost = {cost('', current_state)}")
 
+        # Start a Requested Search in the Background, One at a Time
+        if request is not None:
+            if job is not None:
+                gui.items[-1].setText("A search is already running: press c to cancel it")
+            else:
+                name, solver, exact, kwargs = request
+                job_state = current_state.copy()
+                job = start_solve(name, solver, job_state, exact, args.metric, args.cache, kwargs)
+                gui.items[-1].setText(f"{name}: searching... (press c to cancel)")
+
+    # Stop a Search Still Running
+    if job is not None:
+        job['process'].terminate()
     gui.close()
 
-def astar(state, verbose=False):
-    '''Run A* search on the cube based on its current state and return the solution path.'''
+def cost(node, state):
+    '''Compute the cost g(node)+h(node) for a given set of moves (node) leading to a cube state.
+    Let g(node) be the number of moves it took to get to the state.
+    Let h(node) be the average number of incorrect square colors on the cube. For h(node)=0, all colors will match the center color of that face, which never moves.
+    '''
+
+    # ***MODIFY CODE HERE*** (1 line)
+    g = len(node)
+
+    return g + heuristic(state)
+
+def heuristic(state):
+    '''Compute h for a cube state: the average number of incorrect square colors per face.'''
+    return misplaced(state) / 6
+
+def misplaced(state):
+    '''Count the squares whose color differs from the color of their face when solved.'''
+    return sum(map(ne, state, _FACE_COLORS))
+
+def astar(state, verbose=False, heuristic=heuristic, symmetry=False, moveset=None,
+          stats=None, callback=None, interval=1.0, weight=1.0, time_budget=None,
+          max_nodes=None, beam_width=1000):
+    '''Run A* search on the cube based on its current state and return the solution path.
+    heuristic(state) estimates the number of moves left from a state. With symmetry,
+    states that are the same up to a symmetry of the cube are visited only once.
+    moveset is a move set from build_moveset() (default: the 12 quarter turns).
+    If a stats dict is given, it is filled in as described in new_stats(), and
+    callback(stats) is called about every interval seconds while the search runs.
+    With a weight above 1 the search is weighted A* (f = g + weight*h), which expands
+    far fewer nodes for a solution at most weight times longer than the shortest one
+    (for an admissible h). The search gives up after time_budget seconds, if given.
+    If the node table grows past max_nodes, only the beam_width best open nodes and
+    their ancestors are kept (beam search) so the node table stays bounded, while the
+    cost of every state reached is kept so no state is searched twice. A solution
+    found after that is labeled possibly suboptimal, and stats['pruned'] counts the
+    prunings. beam_width must be smaller than max_nodes.'''
     print('Running A* search...')
     # ***ENTER CODE HERE*** (20-25 lines)
+    actions = (moveset or QUARTER_TURNS)['actions']
+    if symmetry and SIZE != 3:
+        raise ValueError('symmetry reduction only knows the 3x3x3 cube')
+    if max_nodes is not None and beam_width >= max_nodes:
+        raise ValueError(f'beam_width ({beam_width}) must be smaller than max_nodes ({max_nodes})')
     
-    # Initialize Counter
+    # Initialize Counter and Statistics
     cnt = 0
+    stats = new_stats(stats)
+    start = time.perf_counter()
+    next_report = start + interval
 
     # Initialize Desired Solution
     desired_solution = []
     for i in range(6):
-            desired_solution += [i] * 3 ** 2
+            desired_solution += [i] * SIZE ** 2
     
-    # Initialize Priority Queue
-    pq = PriorityQueue()
+    # Initialize Open List (a Binary Heap) and a Counter to Break Ties in Insertion Order
+    open_list = []
+    tie = count()
 
     # Initialize Cost to Nodes
     cost_to_node = {}
     
-    # Initialize Backpointers
-    backpointers = {}
-    
-    # Initialize Starting Node (Sequence of Actions)
-    node = []
+    # Initialize Node Table: Each Node Stores Only its Parent, the Move that Reached it,
+    # its g and its Packed State, so Paths are Rebuilt Once at the Goal
+    parents = [-1]
+    moves = [None]
+    depths = [0]
+    keys = [pack(state)]
 
-    # Add Starting State to Priority Queue
-    pq.put((cost(node, state), node, state))
+    # Visited Nodes are Keyed by Packed State, or by the Packed Symmetry-Class Representative
+    visit_keys = [pack(canonical(state))] if symmetry else keys
 
-    # Add Starting State to List of Visited Nodes (Cost)
-    cost_to_node.update({" ".join(map(str, state)) : cost(node, state)})
+    # Pack the Goal Once so Goal Checks are a Single Integer Comparison
+    goal = pack(desired_solution)
 
-    # Loop Until Solution Found
-    while True:
-         # If Queue is Empty, Return Failure
-        if pq.qsize == 0:
-            solution = "None found... :("
-            break
+    # Add Starting Node to Open List
+    heappush(open_list, (weight * heuristic(state), next(tie), 0))
 
-        # Pop Front Node (Sequence of Actions) from PQ
-        front = pq.get()
+    # Add Starting State to List of Visited Nodes (Cost of Cheapest Path, g)
+    cost_to_node[visit_keys[0]] = 0
+
+    # Loop Until Solution Found or Open List is Empty
+    solution = None
+    while open_list:
+        # Pop Front Node from Open List
+        front_cost, _, front = heappop(open_list)
+        front_key = keys[front]
+
+        # Skip Stale Entries for States that were Reached More Cheaply Since
+        if depths[front] > cost_to_node[visit_keys[front]]:
+            continue
         
         # Increment Count for Each Node Popped
         cnt += 1
+        stats['f'] = front_cost
+        stats['h'] = min(stats['h'], (front_cost - depths[front]) / weight)
+
+        # Report Progress Every Interval Seconds, and Stop Once the Time Budget is Spent
+        if cnt % 256 == 0 and (callback or time_budget is not None):
+            now = time.perf_counter()
+            if time_budget is not None and now - start > time_budget:
+                print(f'time budget of {time_budget} s spent')
+                break
+            if callback and now >= next_report:
+                update_stats(stats, cnt, len(open_list), len(cost_to_node), start)
+                callback(stats)
+                next_report = time.perf_counter() + interval
 
         # Check if Popped Node Contains Goal
-        if front[2] == desired_solution:
+        if front_key == goal:
+            solution = trace_path(parents, moves, front, actions)
             break
 
-        for action in 'UDLRBF':
-            for direction in ['CW', 'CCW']:
-                # Determine Child Action Sequence
-                node = front[1].copy()
-                node.append([action, direction])
-                
-                # Determine Child State from Current State
-                child = simulate(front[2], node)
-                
-                # Determine Cost of Child State
-                child_cost = cost(node, child)
-
-                # Lists cannot be Elements of a Dictionary, so Convert the Lists to Strings
-                child_str = " ".join(map(str, child))
-                front_str = " ".join(map(str, front))
-
-                # Only Add Node to PQ if Child has NOT been visited *OR* Visited with Higher Cost
-                if cost_to_node.get(child_str) == None or cost_to_node.get(child_str) > child_cost:
-                    # Add Child to PQ
-                    pq.put((child_cost, node, child))
-                    # Update Cost
-                    cost_to_node.update({child_str : child_cost})
+        # Unpack the Popped State Once for All of its Children
+        front_state = unpack(front_key)
+        g = depths[front] + 1
+
+        for move, (action, direction) in enumerate(actions):
+            # Determine Child State from Current State
+            timer = time.perf_counter()
+            child = apply_move(front_state, action, direction)
+            stats['generated'] += 1
+            
+            # Determine Cost of Child State
+            moved = time.perf_counter()
+            child_cost = g + weight * heuristic(child)
+            stats['move_time'] += moved - timer
+            stats['heuristic_time'] += time.perf_counter() - moved
+
+            # Pack the Child so it can be Hashed and Stored Compactly
+            child_key = pack(child)
+            visit_key = pack(canonical(child)) if symmetry else child_key
 
+            # Only Add Node to Open List if Child has NOT been visited *OR* Visited with Higher Cost
+            if visit_key not in cost_to_node or cost_to_node[visit_key] > g:
+                if visit_key in cost_to_node:
+                    stats['reopened'] += 1
+                # Add Child to Node Table and Open List
+                parents.append(front)
+                moves.append(move)
+                depths.append(g)
+                keys.append(child_key)
+                if symmetry:
+                    visit_keys.append(visit_key)
+                heappush(open_list, (child_cost, next(tie), len(keys) - 1))
+                # Update Cost
+                cost_to_node[visit_key] = g
+            else:
+                stats['duplicates'] += 1
 
+        # Over the Memory Cap: Keep Only the Best Open Nodes and their Ancestors. Visited
+        # States Keep their Cost, so the Beam Never Searches a State Twice and Cannot Cycle
+        if max_nodes is not None and len(keys) > max_nodes:
+            best = nsmallest(beam_width, (entry for entry in open_list
+                                          if depths[entry[2]] <= cost_to_node[visit_keys[entry[2]]]))
+            tables = [moves, depths, keys] + ([visit_keys] if symmetry else [])
+            open_list, parents, tables = compact_nodes(best, parents, tables)
+            moves, depths, keys = tables[:3]
+            visit_keys = tables[3] if symmetry else keys
+            stats['pruned'] += 1
+
+    update_stats(stats, cnt, len(open_list), len(cost_to_node), start)
+    if callback:
+        callback(stats)
     print(f'searched {cnt} paths')
-    print(f'solution: {printSolution(front[1])}')
+    if solution is None:
+        print('solution: None found... :(')
+    elif stats['pruned']:
+        print(f'solution (possibly suboptimal, open list pruned {stats["pruned"]} times): {printSolution(solution)}')
+    else:
+        print(f'solution: {printSolution(solution)}')
+    return solution
 
-def cost(node, state):
-    '''Compute the cost g(node)+h(node) for a given set of moves (node) leading to a cube state.
-    Let g(node) be the number of moves it took to get to the state.
-    Let h(node) be the average number of incorrect square colors on the cube. For h(node)=0, all colors will match the center color of that face, which never moves.
-    '''
+def compact_nodes(entries, parents, tables):
+    '''Rebuild a node table keeping only the nodes of some open list entries and their
+    ancestors. entries are (cost, tie, node) tuples in heap order, parents the parent
+    of each node and tables the other per-node lists. Returns the entries renumbered,
+    the new parents and the new tables.'''
+    index = {}
+    new_parents = []
+    new_tables = [[] for _ in tables]
+    new_entries = []
+    for cost, tie, node in entries:
+        # Add the Node's Missing Ancestors First, Oldest First
+        chain = []
+        ancestor = node
+        while ancestor != -1 and ancestor not in index:
+            chain.append(ancestor)
+            ancestor = parents[ancestor]
+        for old in reversed(chain):
+            index[old] = len(new_parents)
+            new_parents.append(index[parents[old]] if parents[old] != -1 else -1)
+            for new_table, table in zip(new_tables, tables):
+                new_table.append(table[old])
+        new_entries.append((cost, tie, index[node]))
+    return new_entries, new_parents, new_tables
 
-    # ***MODIFY CODE HERE*** (1 line)
-    g = len(node)
-    
-    h = 0
-    # ***MODIFY CODE HERE*** (7 lines)
-    # the colors are 0-5
-    # the sides are in chunks of 9, concurrent list
-    for side in range(6):
-        center_color = state[4 + side*9]
-        for block in range(9):
-            temp = 0
-            if state[block + side*9] != center_color:
-                h += 1
-    h = h/6
-
-    return g + h
+def anytime_astar(state, weight=3.0, time_budget=10.0, heuristic=heuristic, moveset=None,
+                  stats=None, callback=None, interval=1.0):
+    '''Run anytime weighted A* on the cube and return the best solution path found.
+    Weighted A* (f = g + weight*h) finds a first solution quickly; the search then
+    goes on, pruning every node whose unweighted g+h cannot beat the best solution,
+    and each goal reached improves it, until the open list is empty (the solution is
+    then the shortest for an admissible h) or time_budget seconds are spent.
+    stats (see new_stats) also gets 'bound': the best solution length divided by the
+    smallest g+h left open, so the solution is at most bound times the shortest.'''
+    print('Running anytime weighted A* search...')
+    actions = (moveset or QUARTER_TURNS)['actions']
+
+    # Initialize Counter and Statistics
+    cnt = 0
+    stats = new_stats(stats)
+    start = time.perf_counter()
+    next_report = start + interval
+
+    # Initialize Open List, Cost to Nodes (g) and Node Table, with the h of Each Node
+    open_list = []
+    tie = count()
+    cost_to_node = {}
+    parents = [-1]
+    moves = [None]
+    depths = [0]
+    keys = [pack(state)]
+    hs = [heuristic(state)]
+    goal = pack([i for i in range(6) for _ in range(SIZE ** 2)])
+    heappush(open_list, (weight * hs[0], next(tie), 0))
+    cost_to_node[keys[0]] = 0
+
+    # Loop Until the Open List is Empty or the Time Budget is Spent, Improving the Solution
+    solution = None
+    best = float('inf')
+    while open_list:
+        front_cost, _, front = heappop(open_list)
+        front_key = keys[front]
+        g = depths[front]
+
+        # Skip Stale Entries, and Nodes that Cannot Lead to a Shorter Solution
+        if g > cost_to_node[front_key] or g + hs[front] >= best:
+            continue
+        cnt += 1
+        stats['f'] = front_cost
+        stats['h'] = min(stats['h'], hs[front])
+
+        # Report Progress Every Interval Seconds, and Stop Once the Time Budget is Spent
+        if cnt % 256 == 0:
+            now = time.perf_counter()
+            if now - start > time_budget:
+                print(f'time budget of {time_budget} s spent')
+                heappush(open_list, (front_cost, next(tie), front))
+                break
+            if callback and now >= next_report:
+                update_stats(stats, cnt, len(open_list), len(cost_to_node), start)
+                callback(stats)
+                next_report = time.perf_counter() + interval
+
+        # Record a Shorter Solution
+        if front_key == goal:
+            best = g
+            solution = trace_path(parents, moves, front, actions)
+            print(f'found a solution of {best} moves after {time.perf_counter() - start:.2f} s')
+            continue
+
+        front_state = unpack(front_key)
+        for move, (action, direction) in enumerate(actions):
+            child = apply_move(front_state, action, direction)
+            stats['generated'] += 1
+            child_key = pack(child)
+            if child_key in cost_to_node and cost_to_node[child_key] <= g + 1:
+                stats['duplicates'] += 1
+                continue
+            child_h = heuristic(child)
+            if g + 1 + child_h >= best:
+                continue
+            if child_key in cost_to_node:
+                stats['reopened'] += 1
+            parents.append(front)
+            moves.append(move)
+            depths.append(g + 1)
+            keys.append(child_key)
+            hs.append(child_h)
+            heappush(open_list, (g + 1 + weight * child_h, next(tie), len(keys) - 1))
+            cost_to_node[child_key] = g + 1
+
+    # The Shortest Solution is at Least the Smallest g+h Still Open
+    lower = min([depths[node] + hs[node] for _, _, node in open_list
+                 if depths[node] == cost_to_node[keys[node]]], default=best)
+    if solution is None or lower <= 0:
+        stats['bound'] = float('inf') if solution is None or best > 0 else 1.0
+    else:
+        stats['bound'] = max(best / lower, 1.0)
+
+    update_stats(stats, cnt, len(open_list), len(cost_to_node), start)
+    if callback:
+        callback(stats)
+    print(f'searched {cnt} paths')
+    if solution is None:
+        print('solution: None found... :(')
+    else:
+        print(f"solution: {printSolution(solution)} (at most {stats['bound']:.2f} times the shortest)")
+    return solution
+
+def new_stats(stats=None):
+    '''Reset a search statistics dict (or make a new one) and return it. The keys are:
+    generated and expanded: nodes generated and expanded (popped) so far,
+    duplicates: children dropped because their state was already reached as cheaply,
+    reopened: children whose state was reached again more cheaply,
+    open and closed: the number of entries in the open list and of states visited,
+    f and h: the f of the last node expanded and the smallest h expanded so far,
+    move_time and heuristic_time: seconds spent applying moves and computing costs,
+    elapsed: seconds since the search started,
+    pruned: times the open list was cut down to a beam to stay under a memory cap,
+    nodes: the nodes searched, as printed when the search ends (here, the nodes
+    expanded). Solvers that keep no other statistics fill in only this key.'''
+    stats = {} if stats is None else stats
+    stats.update(generated=0, expanded=0, duplicates=0, reopened=0, open=0, closed=0,
+                 f=0, h=float('inf'), move_time=0.0, heuristic_time=0.0, elapsed=0.0, pruned=0, nodes=0)
+    return stats
+
+def update_stats(stats, expanded, open_size, closed_size, start):
+    '''Bring the counts of a search statistics dict that a search keeps elsewhere up to
+    date: nodes expanded, open and closed list sizes and the time since start.'''
+    stats['expanded'] = stats['nodes'] = expanded
+    stats['open'] = open_size
+    stats['closed'] = closed_size
+    stats['elapsed'] = time.perf_counter() - start
+
+def format_stats(stats):
+    '''Format search statistics as one line, for logs and status text.'''
+    return (f"expanded {stats['expanded']}, generated {stats['generated']}, open {stats['open']}, "
+            f"closed {stats['closed']}, f {stats['f']:.2f}, best h {stats['h']:.2f}, {stats['elapsed']:.1f} s")
+
+def trace_path(parents, moves, node, actions=None):
+    '''Rebuild the list of [face, direction] actions leading to a node of a node table,
+    whose moves are ids into actions (default: the 12 quarter turns).'''
+    actions = actions or ACTIONS
+    path = []
+    while parents[node] != -1:
+        path.append(actions[moves[node]])
+        node = parents[node]
+    path.reverse()
+    return path
+
+def idastar(state, heuristic=heuristic, max_depth=20, moveset=None, stats=None):
+    '''Run iterative-deepening A* search on the cube and return the solution path.
+    Each iteration is a depth-first search cut off where g+h exceeds the current
+    f-bound, so memory use is linear in the solution depth. Paths longer than
+    max_depth moves are never explored, and redundant move sequences are skipped
+    with the move set's successor table (default: the 12 quarter turns).
+    If a stats dict is given, stats['nodes'] gets the number of nodes expanded.'''
+    print('Running IDA* search...')
+    moveset = moveset or QUARTER_TURNS
+    actions, successors = moveset['actions'], moveset['successors']
+
+    # Initialize Desired Solution
+    goal = bytes([i for i in range(6) for _ in range(SIZE ** 2)])
+
+    # Initialize Current Path (Move Ids) and Count of Nodes Expanded in an Iteration
+    path = []
+    expanded = 0
+
+    def search(node_state, g, bound, p2, p1):
+        '''Depth-first search below a node reached by the moves p2 then p1. Returns
+        True at the goal, otherwise the smallest f that exceeded the bound.'''
+        nonlocal expanded
+        f = g + heuristic(node_state)
+        if f > bound:
+            return f
+        if node_state == goal:
+            return True
+        if g == max_depth:
+            return float('inf')
+
+        expanded += 1
+        next_bound = float('inf')
+        for move in successors[p2][p1]:
+            action, direction = actions[move]
+            child = apply_move(node_state, action, direction)
+            path.append(move)
+            result = search(child, g + 1, bound, p1, move)
+            if result is True:
+                return True
+            next_bound = min(next_bound, result)
+            path.pop()
+        return next_bound
+
+    # Raise the f-Bound to the Smallest Exceeding f Until the Goal is Found
+    state = bytes(state)
+    bound = heuristic(state)
+    cnt = 0
+    solution = None
+    while True:
+        expanded = 0
+        result = search(state, 0, bound, moveset['none'], moveset['none'])
+        cnt += expanded
+        print(f'f-bound {bound:.2f}: expanded {expanded} nodes')
+        if result is True:
+            solution = [actions[move] for move in path]
+            break
+        if result == float('inf'):
+            break
+        bound = result
+
+    if stats is not None:
+        stats['nodes'] = cnt
+    print(f'searched {cnt} paths')
+    if solution is None:
+        print('solution: None found... :(')
+    else:
+        print(f'solution: {printSolution(solution)}')
+    return solution
+
+def bidirectional(state, max_depth=20, moveset=None, stats=None):
+    '''Run bidirectional breadth-first search on the cube and return the solution path.
+    Layers are expanded alternately from the scramble and from the solved cube (the
+    smaller frontier first) until the two searches reach a common state. Explores
+    about 2*12^(d/2) states instead of 12^d for a solution of d moves.
+    moveset is a move set from build_moveset() (default: the 12 quarter turns).
+    If a stats dict is given, stats['nodes'] gets the number of states expanded.'''
+    print('Running bidirectional search...')
+    actions = (moveset or QUARTER_TURNS)['actions']
+
+    # Initialize Desired Solution
+    desired_solution = []
+    for i in range(6):
+        desired_solution += [i] * SIZE ** 2
+
+    # Initialize One Node Table (Parent, Move, Packed State) and Visited Index per Direction
+    sides = []
+    for start in [state, desired_solution]:
+        key = pack(start)
+        sides.append({'parents': [-1], 'moves': [None], 'keys': [key],
+                      'visited': {key: 0}, 'frontier': [0], 'depth': 0})
+    forward, backward = sides
+
+    # Initialize Counter
+    cnt = 0
+
+    # The Scramble May Already be Solved
+    meeting = None
+    if forward['keys'][0] == backward['keys'][0]:
+        meeting = (0, 0)
+
+    # Expand the Smaller Frontier by One Layer Until the Searches Meet
+    while meeting is None and forward['frontier'] and backward['frontier']:
+        if forward['depth'] + backward['depth'] >= max_depth:
+            break
+        side, other = (forward, backward) if len(forward['frontier']) <= len(backward['frontier']) else (backward, forward)
+        side['depth'] += 1
+        next_frontier = []
+        for node in side['frontier']:
+            cnt += 1
+            node_state = unpack(side['keys'][node])
+            for move, (action, direction) in enumerate(actions):
+                child_key = pack(apply_move(node_state, action, direction))
+                if child_key in side['visited']:
+                    continue
+
+                # Add Child to This Side's Node Table
+                side['parents'].append(node)
+                side['moves'].append(move)
+                side['keys'].append(child_key)
+                side['visited'][child_key] = len(side['keys']) - 1
+                next_frontier.append(len(side['keys']) - 1)
+
+                # Check if the Other Search has Already Reached the Child
+                if child_key in other['visited']:
+                    meeting = (forward['visited'][child_key], backward['visited'][child_key])
+                    break
+            if meeting is not None:
+                break
+        side['frontier'] = next_frontier
+
+    # Join the Half-Paths: the Backward Half is Undone in Reverse Order
+    solution = None
+    if meeting is not None:
+        solution = trace_path(forward['parents'], forward['moves'], meeting[0], actions)
+        solution += invert(trace_path(backward['parents'], backward['moves'], meeting[1], actions))
+
+    if stats is not None:
+        stats['nodes'] = cnt
+    print(f'searched {cnt} paths')
+    if solution is None:
+        print('solution: None found... :(')
+    else:
+        print(f'solution: {printSolution(solution)}')
+    return solution
+
+# Number of children a HDA* worker collects for another worker before sending them
+HDA_BATCH = 64
+
+def hdastar(state, heuristic=heuristic, workers=None, moveset=None, stats=None):
+    '''Run hash-distributed A* (HDA*) search across worker processes and return the
+    solution path. Every state is owned by the worker chosen by the hash of its
+    packed state; each worker keeps its own open and closed lists and sends the
+    children it generates to their owners in batches. The first goal found sets an
+    upper bound, and the search ends once no worker holds a node that could beat it
+    and no batch is in flight, so the path is as short as the one A* finds.
+    workers defaults to one per core. If a stats dict is given, stats['nodes'] gets
+    the number of nodes all workers expanded.'''
+    workers = workers or os.cpu_count()
+    actions = (moveset or QUARTER_TURNS)['actions']
+    print(f'Running HDA* search with {workers} workers...')
+
+    # Initialize One Inbox per Worker and a Queue for Solutions and Counts
+    inboxes = [Queue() for _ in range(workers)]
+    results = Queue()
+
+    # Termination is Detected Under One Lock: All Workers Idle and Every Sent Batch Received
+    lock = Lock()
+    sent = Value('q', 0, lock=False)
+    received = Value('q', 0, lock=False)
+    idle = Array('b', workers, lock=False)
+    stop = Value('b', 0, lock=False)
+
+    # Cost of the Best Solution Found so Far
+    incumbent = Value('d', float('inf'), lock=False)
+
+    processes = [Process(target=_hda_worker,
+                         args=(i, inboxes, results, lock, sent, received, idle, stop, incumbent, heuristic, actions,
+                               SIZE, dict(MACROS)))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    # Send the Starting State to its Owner
+    key = pack(state)
+    with lock:
+        sent.value += 1
+    inboxes[hash(key) % workers].put([(key, 0, b'')])
+
+    # Wait Until No Worker can Improve on the Best Solution; Workers Only Exit Once Stopped
+    while True:
+        time.sleep(0.01)
+        _hda_check(processes, lambda process: process.exitcode is not None)
+        with lock:
+            if all(idle) and sent.value == received.value:
+                stop.value = 1
+                break
+
+    # Collect the Solutions and Node Counts of All Workers
+    solution = None
+    cnt = 0
+    for _ in range(workers):
+        while True:
+            try:
+                expanded, path = results.get(timeout=1)
+                break
+            except Empty:
+                _hda_check(processes, lambda process: process.exitcode)
+        cnt += expanded
+        if path is not None and (solution is None or len(path) < len(solution)):
+            solution = path
+    for process in processes:
+        process.join()
+    if solution is not None:
+        solution = [actions[move] for move in solution]
+
+    if stats is not None:
+        stats['nodes'] = cnt
+    print(f'searched {cnt} paths')
+    if solution is None:
+        print('solution: None found... :(')
+    else:
+        print(f'solution: {printSolution(solution)}')
+    return solution
+
+def _hda_check(processes, failed):
+    '''Terminate every HDA* worker and raise RuntimeError if failed(process) holds for
+    one of them, so a worker that died does not leave hdastar() waiting forever.'''
+    for i, process in enumerate(processes):
+        if failed(process):
+            for other in processes:
+                other.terminate()
+                other.join()
+            raise RuntimeError(f'HDA* worker {i} died with exit code {process.exitcode}')
+
+def _hda_worker(i, inboxes, results, lock, sent, received, idle, stop, incumbent, heuristic, actions, size, macros):
+    '''Search the states owned by worker i for hdastar(). Nodes carry their path as
+    a bytes string of move ids, so no parent pointers cross process boundaries.
+    Puts (nodes expanded, best path found or None) on results when stopped, and
+    gives up without a word if the process that started it is gone (e.g. a GUI
+    search that was cancelled), so no worker outlives its search.'''
+    use_cube(size, macros)
+    workers = len(inboxes)
+    parent = os.getppid()
+    goal = pack([i for i in range(6) for _ in range(SIZE ** 2)])
+
+    # Initialize Open List, Cost to Nodes and One Outgoing Batch per Worker
+    open_list = []
+    tie = count()
+    cost_to_node = {}
+    outgoing = [[] for _ in range(workers)]
+    expanded = 0
+    best = None
+
+    def add(key, g, path):
+        '''Add a node owned by this worker unless its state was reached as cheaply.'''
+        if cost_to_node.get(key, g + 1) <= g:
+            return
+        cost_to_node[key] = g
+        f = g + heuristic(unpack(key))
+        if f < incumbent.value:
+            heappush(open_list, (f, next(tie), g, key, path))
+
+    def flush(owner):
+        '''Send the batch collected for another worker.'''
+        with lock:
+            sent.value += 1
+        inboxes[owner].put(outgoing[owner])
+        outgoing[owner] = []
+
+    while not stop.value:
+        # Give Up when Orphaned, Without Waiting to Flush Batches Nobody will Read
+        if os.getppid() != parent:
+            for queue in inboxes + [results]:
+                queue.cancel_join_thread()
+            return
+
+        # Take in Every Batch Waiting in the Inbox, Blocking Briefly when Out of Work
+        while True:
+            try:
+                batch = inboxes[i].get(timeout=0.01) if idle[i] else inboxes[i].get_nowait()
+            except Empty:
+                break
+            with lock:
+                received.value += 1
+                idle[i] = 0
+            for key, g, path in batch:
+                add(key, g, path)
+
+        # Expand a Few Nodes that can Still Beat the Best Solution
+        for _ in range(HDA_BATCH):
+            if not open_list or open_list[0][0] >= incumbent.value:
+                open_list = []
+                break
+            f, _, g, key, path = heappop(open_list)
+
+            # Skip Stale Entries for States that were Reached More Cheaply Since
+            if g > cost_to_node[key]:
+                continue
+            expanded += 1
+
+            # Record a Better Solution and Lower the Bound for Every Worker
+            if key == goal:
+                with lock:
+                    if g < incumbent.value:
+                        incumbent.value = g
+                        best = path
+                continue
+
+            node_state = unpack(key)
+            for move, (action, direction) in enumerate(actions):
+                child_key = pack(apply_move(node_state, action, direction))
+                owner = hash(child_key) % workers
+                if owner == i:
+                    add(child_key, g + 1, path + bytes([move]))
+                else:
+                    outgoing[owner].append((child_key, g + 1, path + bytes([move])))
+                    if len(outgoing[owner]) >= HDA_BATCH:
+                        flush(owner)
+
+        # Out of Work: Send Every Partial Batch, then Report Idle
+        if not open_list:
+            for owner in range(workers):
+                if outgoing[owner]:
+                    flush(owner)
+            with lock:
+                idle[i] = 1
+
+    results.put((expanded, best))
+
+def beam_search(state, width=1024, max_depth=40, moveset=None, stats=None):
+    '''Run beam search on the cube and return the solution path. Each layer of the
+    search is expanded as one NumPy block (see expand_block) and only the width
+    children with the fewest misplaced squares are kept, so every layer costs a few
+    array operations and memory stays bounded, but the solution may be longer than
+    optimal or not found at all. Requires NumPy. If a stats dict is given,
+    stats['nodes'] gets the number of states expanded over all layers.'''
+    import numpy as np
+    print('Running beam search...')
+    actions = (moveset or QUARTER_TURNS)['actions']
+    moves = move_table(actions)
+
+    # Initialize Frontier Block, Keys of Visited States and One (Parents, Moves) Pair per Layer
+    frontier = np.frombuffer(bytes(state), dtype=np.uint8).reshape(1, len(state))
+    visited = {frontier.tobytes()}
+    layers = []
+
+    # Initialize Counter
+    cnt = 0
+
+    # Expand the Whole Beam at Once Until a Child is Solved
+    found = 0 if misplaced(state) == 0 else None
+    while found is None and len(frontier) and len(layers) < max_depth:
+        cnt += len(frontier)
+        children = expand_block(frontier, moves)
+        h = misplaced_block(children)
+
+        # Drop Children Repeated in this Layer or Visited Before, Using the Raw Squares as Keys
+        keys = children.view(np.dtype((np.void, len(state)))).ravel()
+        _, first = np.unique(keys, return_index=True)
+        new = first[np.fromiter((key not in visited for key in keys[first].tolist()), dtype=bool, count=len(first))]
+
+        # Keep the Width Children with the Fewest Misplaced Squares
+        if len(new) > width:
+            new = new[np.argpartition(h[new], width)[:width]]
+        visited.update(keys[new].tolist())
+        layers.append((new // len(actions), new % len(actions)))
+        frontier = children[new]
+
+        solved = np.flatnonzero(h[new] == 0)
+        if len(solved):
+            found = solved[0]
+
+    # Rebuild the Path Layer by Layer from the Solved Child
+    solution = None
+    if found is not None:
+        solution = []
+        node = found
+        for parents, layer_moves in reversed(layers):
+            solution.append(actions[layer_moves[node]])
+            node = parents[node]
+        solution.reverse()
+
+    if stats is not None:
+        stats['nodes'] = cnt
+    print(f'searched {cnt} paths')
+    if solution is None:
+        print('solution: None found... :(')
+    else:
+        print(f'solution: {printSolution(solution)}')
+    return solution
+
+def twophase(state, max_length=30, timeout=0.5, stats=None):
+    '''Solve the cube with Kociemba's two-phase algorithm and return the solution path.
+    Finds near-optimal solutions of scrambles of any depth; see kociemba.solve(),
+    which also fills in stats['nodes'] if a stats dict is given.'''
+    print('Running two-phase solver...')
+    solution = kociemba.solve(state, max_length, timeout, stats)
+    if solution is None:
+        print('solution: None found... :(')
+    else:
+        print(f'solution: {printSolution(solution)}')
+    return solution
+
+def open_cache(path):
+    '''Open (creating if needed) an SQLite solution cache. Each row holds a symmetry
+    class representative (see canonical) as its packed state, the metric, its exact
+    distance to the solved cube and a solution of that length, as printed by
+    printSolution. One row serves all 48 symmetric states of the class.'''
+    db = sqlite3.connect(path, timeout=30)
+    db.execute('CREATE TABLE IF NOT EXISTS solutions (state BLOB, metric TEXT, distance INTEGER, '
+               'solution TEXT, PRIMARY KEY (state, metric)) WITHOUT ROWID')
+    db.commit()
+    return db
+
+def _cache_key(image):
+    '''Key of a canonical state in the solution cache: its packed state as bytes.'''
+    return pack(image).to_bytes(21, 'big')
+
+def cache_lookup(db, state, metric='quarter'):
+    '''Return a cached optimal solution of a state as a list of actions, or None.
+    The cached solution of the class representative is mapped back through the
+    symmetry that takes the state to the representative.'''
+    k, image = canonical_symmetry(state)
+    row = db.execute('SELECT solution FROM solutions WHERE state = ? AND metric = ?',
+                     (_cache_key(image), metric)).fetchone()
+    if row is None:
+        return None
+    preimage = {image_move: move for move, image_move in _SYMMETRY_MOVES[k].items()}
+    return [list(preimage[face, direction]) for face, direction in (parse_moves(row[0]) if row[0] else [])]
+
+def cache_store(db, state, solution, metric='quarter'):
+    '''Store an optimal solution of a state: the start state and every state along the
+    path get their exact distance and the rest of the path as their solution. An
+    entry is only replaced by a shorter one.'''
+    rows = []
+    state = bytes(state)
+    for i in range(len(solution) + 1):
+        k, image = canonical_symmetry(state)
+        rest = [_SYMMETRY_MOVES[k][face, direction] for face, direction in solution[i:]]
+        rows.append((_cache_key(image), metric, len(rest), printSolution(rest)))
+        if i < len(solution):
+            state = apply_move(state, *solution[i])
+    db.executemany('INSERT INTO solutions VALUES (?, ?, ?, ?) ON CONFLICT (state, metric) DO UPDATE '
+                   'SET distance = excluded.distance, solution = excluded.solution '
+                   'WHERE excluded.distance < distance', rows)
+    db.commit()
+
+def is_exact(solver, heuristic, metric, macros=()):
+    '''Whether a solver returns solutions of exactly the distance of the state in the
+    metric, so they may be stored in the solution cache: bidirectional search always,
+    and A*, IDA* and HDA* with the pattern databases in the quarter-turn metric, where
+    they never overestimate. Macro moves are not counted as single turns in the cache.'''
+    if macros:
+        return False
+    if solver is bidirectional:
+        return True
+    return solver in (astar, idastar, hdastar) and heuristic is pattern_db.heuristic and metric == 'quarter'
+
+def cached_solve(db, state, solver, exact, metric='quarter', **kwargs):
+    '''Solve a state with solver(state, **kwargs), returning the solution from the
+    solution cache db instead if it holds one. A solution found is written back to
+    the cache if exact (see is_exact). db may be None to solve without a cache.'''
+    if db is not None:
+        solution = cache_lookup(db, state, metric)
+        if solution is not None:
+            print(f'solution (cached): {printSolution(solution)}')
+            return solution
+    solution = solver(state, **kwargs)
+    if db is not None and exact and solution is not None:
+        cache_store(db, state, solution, metric)
+    return solution
+
+def start_solve(name, solver, state, exact, metric, cache, kwargs):
+    '''Start solver(state, **kwargs) in a background process, through the solution
+    cache file cache (if any; see cached_solve). Returns the job: a dict with the
+    process and the queue on which it reports ('progress', text) messages and finally
+    ('done', solution). Searches that take a callback report their statistics.'''
+    results = Queue()
+    process = Process(target=_solve_worker, args=(results, name, solver, state, exact, metric, cache, kwargs,
+                                                  SIZE, dict(MACROS)))
+    process.start()
+    return {'process': process, 'results': results}
+
+def _solve_worker(results, name, solver, state, exact, metric, cache, kwargs, size, macros):
+    '''Run a search for start_solve() and send its progress and solution to results.'''
+    use_cube(size, macros)
+    db = open_cache(cache) if cache else None
+    if solver in (astar, anytime_astar):
+        kwargs = dict(kwargs, callback=lambda stats: results.put(('progress', f'{name}: ' + format_stats(stats))))
+    results.put(('done', cached_solve(db, state, solver, exact, metric, **kwargs)))
+
+def poll_solve(job, txt):
+    '''Show the progress messages of a background search (see start_solve) in a Text
+    object, without blocking. Returns (True, solution) once the search is over, where
+    solution is None if none was found, and (False, None) while it runs.'''
+    while True:
+        try:
+            kind, value = job['results'].get_nowait()
+        except Empty:
+            # A Search that Died Without Reporting Found Nothing
+            if not job['process'].is_alive() and job['results'].empty():
+                return True, None
+            return False, None
+        if kind == 'progress':
+            txt.setText(value)
+        else:
+            job['process'].join()
+            return True, value
+
+def check_state(state):
+    '''Raise ValueError, saying why, if a state of the current cube size cannot be
+    solved. A 3x3x3 state is checked by cubie.validate(); on other sizes only the
+    number of squares of each color is checked. The centers of an odd cube must have
+    the colors of their faces in the solved cube the solvers aim for.'''
+    if SIZE == 3:
+        cubie.validate(state)
+    elif len(state) != 6 * SIZE ** 2:
+        raise ValueError(f'a {SIZE}x{SIZE}x{SIZE} cube has {6 * SIZE ** 2} squares, not {len(state)}')
+    else:
+        counts = [list(state).count(color) for color in range(6)]
+        if counts != [SIZE ** 2] * 6:
+            raise ValueError(f'every color needs {SIZE ** 2} squares, found {counts}')
+    if SIZE % 2 and any(state[face * SIZE ** 2 + SIZE ** 2 // 2] != face for face in range(6)):
+        raise ValueError('the centers must have colors 0-5 in the order U, L, F, R, B, D')
+
+def read_state(path):
+    '''Read a cube state from a text file holding one digit (color) per square.
+    Raises ValueError if the file does not hold a cube state that can be solved.'''
+    with open(path) as f:
+        text = f.read().strip()
+    if len(text) != 6 * SIZE ** 2 or not set(text) <= set('012345'):
+        raise ValueError(f'{path} does not hold {6 * SIZE ** 2} colors 0-5')
+    state = [int(c) for c in text]
+    try:
+        check_state(state)
+    except ValueError as e:
+        raise ValueError(f'{path} is not solvable: {e}') from None
+    return state
+
+def solve_file(task):
+    '''Solve the state in one file for batch(). task is a (path, options) pair, where
+    options is a dict of the command-line arguments (see parser). Returns a dict with
+    the solution (as printed by printSolution), its length, the number of nodes
+    searched (from the solver's stats; None for a solution from the cache), the wall
+    time in seconds and the peak memory of the worker process in kilobytes, or the
+    error. Solutions that A* found after pruning its open list to
+    stay under --max-nodes are marked possibly suboptimal.'''
+    path, options = task
+    set_size(options['size'])
+    solver, heuristic_name, metric, macros = options['solver'], options['heuristic'], options['metric'], options['macro']
+    weight, time_budget, cache = options['weight'], options['time_budget'], options['cache']
+    result = {'file': path}
+    stats = {}
+    try:
+        state = read_state(path)
+        for macro in macros:
+            name, sequence = macro.split('=', 1)
+            define_macro(name.strip(), parse_moves(sequence))
+        moveset = build_moveset(metric, MACROS)
+        h = pattern_db.heuristic if heuristic_name == 'pdb' else heuristic
+        db = open_cache(cache) if cache else None
+
+        # Load the Tables Before Timing, so the Time is the Search Alone
+        if heuristic_name == 'pdb':
+            pattern_db.load()
+        if solver == 'twophase':
+            kociemba.load()
+
+        # The Solvers Report Progress on Standard Output: Silence It
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            if solver == 'astar':
+                solution = cached_solve(db, state, astar, is_exact(astar, h, metric, macros) and weight == 1
+                                        and options['max_nodes'] is None, metric, heuristic=h, moveset=moveset,
+                                        weight=weight, time_budget=time_budget, stats=stats,
+                                        max_nodes=options['max_nodes'], beam_width=options['beam_width'])
+            elif solver == 'anytime':
+                solution = cached_solve(db, state, anytime_astar, False, metric, heuristic=h, moveset=moveset,
+                                        weight=weight if weight > 1 else 3.0, time_budget=time_budget or 10.0,
+                                        stats=stats)
+            elif solver == 'idastar':
+                solution = cached_solve(db, state, idastar, is_exact(idastar, h, metric, macros), metric,
+                                        heuristic=h, moveset=moveset, stats=stats)
+            elif solver == 'bidirectional':
+                solution = cached_solve(db, state, bidirectional, is_exact(bidirectional, h, metric, macros), metric,
+                                        moveset=moveset, stats=stats)
+            elif solver == 'beam':
+                solution = cached_solve(db, state, beam_search, False, metric, moveset=moveset, stats=stats)
+            else:
+                solution = cached_solve(db, state, twophase, False, metric, stats=stats)
+        result['time'] = time.perf_counter() - start
+
+        result['solution'] = printSolution(solution) if solution is not None else None
+        result['length'] = len(solution) if solution is not None else None
+        result['nodes'] = stats.get('nodes')
+        if stats.get('pruned'):
+            result['possibly_suboptimal'] = True
+    except (OSError, ValueError) as e:
+        result['error'] = str(e)
+    result['peak_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+def batch(args):
+    '''Solve every state file named by args.batch (a directory or a glob pattern)
+    across a pool of args.jobs worker processes, writing one JSON line per state as
+    soon as it is solved. Each worker solves a single state, so the peak memory
+    reported for a state is its own.'''
+    if os.path.isdir(args.batch):
+        paths = sorted(glob.glob(os.path.join(args.batch, '*.txt')))
+    else:
+        paths = sorted(glob.glob(args.batch))
+    tasks = [(path, vars(args)) for path in paths]
+
+    # Generate Missing Two-Phase Tables Once Here, Rather than in Every Worker
+    if args.solver == 'twophase':
+        with redirect_stdout(sys.stderr):
+            kociemba.load()
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    with Pool(args.jobs, maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(solve_file, tasks):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+    if out is not sys.stdout:
+        out.close()
 
 def drawface(gui, x0, y0, c, n, w, t):
     '''Draw an individual face of the cube. Requires GraphWin object, starting (x,y) position of the top-left corner of the face, face color, number of squares per row/column, pixel width of each square, and border thickness.'''
+    from graphics import Point, Rectangle
     for i in range(n):
         for j in range(n):
             x = x0 + j * w
@@ -222,7 +1244,9 @@ def drawface(gui, x0, y0, c, n, w, t):
             square.draw(gui)
 
 def guisetup(params):
-    '''Create graphical user interface for Rubik's Cube with n rows and columns.'''
+    '''Create graphical user interface for Rubik's Cube with n rows and columns.
+    The graphics module (and Tk) is only loaded here, so the solvers run headless.'''
+    from graphics import GraphWin, Point, Text
 
     # Extract relevant parameters
     n = params['n']
@@ -259,53 +1283,296 @@ def guisetup(params):
     # Return gui object and list of cube square color indices
     return gui
 
+def compose(*perms):
+    '''Compose permutations, applied left to right, into a single permutation.
+    A permutation p maps a state s to the state [s[p[0]], s[p[1]], ...].'''
+    result = tuple(range(len(perms[0])))
+    for p in perms:
+        result = tuple(result[i] for i in p)
+    return result
+
+def compile_sequence(actions):
+    '''Compile a sequence of [face, direction] actions into one permutation.'''
+    return compose(*(MOVES[face, direction] for face, direction in actions))
+
+def _sticker_geometry(n=3):
+    '''Return the (position, outward normal) of every square of an n x n x n cube as
+    integer vectors, with x pointing right, y up and z out of the front face, and the
+    cube centered at 0. Coordinates are doubled so they are integers for every n: the
+    faces lie in the planes at -n and n, and the squares of a row at -(n-1), -(n-3), ..., n-1.'''
+    # Square (row, column) of each face -> (x, y, z), following the GUI net
+    d = n - 1
+    layouts = [lambda r, c: (2 * c - d, n, 2 * r - d),   # U
+               lambda r, c: (-n, d - 2 * r, 2 * c - d),  # L
+               lambda r, c: (2 * c - d, d - 2 * r, n),   # F
+               lambda r, c: (n, d - 2 * r, d - 2 * c),   # R
+               lambda r, c: (d - 2 * c, d - 2 * r, -n),  # B
+               lambda r, c: (2 * c - d, -n, d - 2 * r)]  # D
+    return [(layout(r, c), normal) for layout, normal in zip(layouts, _NORMALS)
+            for r in range(n) for c in range(n)]
+
+# Outward normal of each face, in the order of the squares (U, L, F, R, B, D)
+_NORMALS = [(0, 1, 0), (-1, 0, 0), (0, 0, 1), (1, 0, 0), (0, 0, -1), (0, -1, 0)]
+
+# Middle layer of an odd cube on the axis of a face, named after the face it turns like
+_MIDDLES = {'L': 'M', 'D': 'E', 'F': 'S'}
+
+# Face on the opposite side of the cube from each face
+OPPOSITE = {'U': 'D', 'D': 'U', 'L': 'R', 'R': 'L', 'B': 'F', 'F': 'B'}
+
+def layer_names(n):
+    '''Return the layers of an n x n x n cube that can be turned, as a dict mapping each
+    name to (face, k): the k-th layer from a face, turning clockwise as seen from that
+    face. Outer layers are named after their face (U/D/L/R/B/F), inner layers after
+    their depth and nearest face (2R is the layer next to R), and the middle layers of
+    an odd cube M (turning like L), E (like D) and S (like F).'''
+    layers = {}
+    for face in 'UDLRBF':
+        for k in range(1, n // 2 + 1):
+            layers[face if k == 1 else f'{k}{face}'] = (face, k)
+    if n % 2:
+        for face, name in _MIDDLES.items():
+            layers[name] = (face, n // 2 + 1)
+    return layers
+
+def layer_move(face, k, direction='CW'):
+    '''Return the action [layer, direction] turning the k-th layer from a face in a
+    direction seen from that face, on a cube of the current size (see set_size).'''
+    inverse = {'CW': 'CCW', 'CCW': 'CW', '180': '180'}
+    if k > (SIZE + 1) // 2:
+        face, k, direction = OPPOSITE[face], SIZE + 1 - k, inverse[direction]
+    if SIZE % 2 and k == SIZE // 2 + 1:
+        if face not in _MIDDLES:
+            face, direction = OPPOSITE[face], inverse[direction]
+        return [_MIDDLES[face], direction]
+    return [face if k == 1 else f'{k}{face}', direction]
+
+def _layer_turn(geometry, index, axis, depths):
+    '''Return the permutation turning clockwise, as seen from the tip of an axis, the
+    squares whose (doubled) position along the axis is in depths.'''
+    def turn(v):
+        # Rotate by -90 degrees about the axis: v -> a (a.v) - a x v
+        dot = sum(a * b for a, b in zip(axis, v))
+        cross = (axis[1] * v[2] - axis[2] * v[1],
+                 axis[2] * v[0] - axis[0] * v[2],
+                 axis[0] * v[1] - axis[1] * v[0])
+        return tuple(a * dot - c for a, c in zip(axis, cross))
+    perm = list(range(len(geometry)))
+    for j, (position, normal) in enumerate(geometry):
+        if sum(a * b for a, b in zip(axis, position)) in depths:
+            perm[index[turn(position), turn(normal)]] = j
+    return tuple(perm)
+
+def _turns_rest(name, n):
+    '''Whether a layer of an n x n x n cube is turned by turning the rest of the cube
+    (see generate_moves).'''
+    return name in _MIDDLES.values() or (n % 2 == 0 and name in ('L', 'D', 'B'))
+
+# Move tables made by generate_moves(), keyed by cube size
+_MOVE_TABLES = {}
+
+def generate_moves(n):
+    '''Generate the permutation of every layer turn (see layer_names) of an n x n x n
+    cube from its geometry, keyed by (layer, direction) like MOVES, for the directions
+    CW, CCW and 180. The tables are built once per size.
+    The centers of an odd cube and the DBL corner of an even one fix the orientation
+    of the cube, so a layer holding them (a middle layer, or L, D or B on an even
+    cube) is turned by turning every other layer on its axis the other way: the same
+    turn up to a rotation of the whole cube, which keeps the solved cube unique.'''
+    if n in _MOVE_TABLES:
+        return _MOVE_TABLES[n]
+    geometry = _sticker_geometry(n)
+    index = {square: i for i, square in enumerate(geometry)}
+    moves = {}
+    for name, (face, k) in layer_names(n).items():
+        axis = _NORMALS['ULFRBD'.index(face)]
+        depths = {n + 1 - 2 * k, n} if k == 1 else {n + 1 - 2 * k}
+        if _turns_rest(name, n):
+            axis = tuple(-a for a in axis)
+            depths = {-d for d in range(-n, n + 1) if d not in depths}
+        cw = _layer_turn(geometry, index, axis, depths)
+        moves[name, 'CW'] = cw
+        moves[name, 'CCW'] = compose(cw, cw, cw)
+        moves[name, '180'] = compose(cw, cw)
+    _MOVE_TABLES[n] = moves
+    return moves
+
+# Number of squares per row and column of the cube, changed by set_size()
+SIZE = 3
+
+# Layers of the cube that can be turned (see layer_names)
+LAYERS = layer_names(SIZE)
+
+# Permutation tuples of every layer turn in the 3 directions, keyed by (layer, direction);
+# define_macro() adds macro moves keyed by (name, 'MACRO')
+MOVES = dict(generate_moves(SIZE))
+
+# Face turns making up each macro move, keyed by name
+MACROS = {}
+
+# Number of clockwise quarter turns in each face-turn direction
+QUARTERS = {'CW': 1, '180': 2, 'CCW': 3}
+
+def _compile_successors(actions):
+    '''Build the move filter table successors[p2][p1]: the move ids worth trying after
+    the moves p2 then p1, where len(actions) stands for no move. A move is skipped if
+    the sequence reaches the same state as a shorter or a canonical one: turns of one
+    face that cancel or add up to a single available move, a second counterclockwise
+    quarter turn (same as two clockwise ones), a third turn of the same face, or the
+    later layer first of two commuting moves on one axis (D then U is the same as U
+    then D). Macro moves are never skipped and do not restrict the next move.'''
+    none = len(actions)
+    available = {(face, QUARTERS[direction]) for face, direction in actions if direction != 'MACRO'}
+    axis = {name: 'UDLRBF'.index(face) // 2 for name, (face, _) in LAYERS.items()}
+    order = {name: i for i, name in enumerate(LAYERS)}
+    successors = []
+    for p2 in range(none + 1):
+        row = []
+        for p1 in range(none + 1):
+            allowed = []
+            for move, (face, direction) in enumerate(actions):
+                if p1 != none and direction != 'MACRO' and actions[p1][1] != 'MACRO':
+                    last_face, last_direction = actions[p1]
+                    if face == last_face:
+                        total = (QUARTERS[last_direction] + QUARTERS[direction]) % 4
+                        if total == 0 or (face, total) in available or direction == 'CCW':
+                            continue
+                        if p2 != none and actions[p2][0] == face and actions[p2][1] != 'MACRO':
+                            continue
+                    if face != last_face and axis[face] == axis[last_face] and order[face] < order[last_face]:
+                        continue
+                allowed.append(move)
+            row.append(tuple(allowed))
+        successors.append(row)
+    return successors
+
+def build_moveset(metric='quarter', macros=()):
+    '''Return the moves a search may use, as a dict with the list of [face, direction]
+    actions ('actions'), their move filter table ('successors', see
+    _compile_successors) and the move id that stands for no move ('none').
+    The quarter-turn metric uses the quarter turns of every layer that is not turned
+    by turning the rest of the cube (see generate_moves), as the other layers make up
+    those turns: on the 3x3x3 cube the 12 face quarter turns, on the 2x2x2 cube the
+    turns of U, R and F. The half-turn metric adds their half turns (direction '180').
+    Macros named in macros (see define_macro) are added as single moves.'''
+    directions = ['CW', 'CCW'] if metric == 'quarter' else ['CW', 'CCW', '180']
+    actions = [[layer, direction] for layer in LAYERS if not _turns_rest(layer, SIZE)
+               for direction in directions]
+    actions += [[name, 'MACRO'] for name in macros]
+    return {'actions': actions, 'successors': _compile_successors(actions), 'none': len(actions)}
+
+# The default move set: the quarter turns (see set_size)
+QUARTER_TURNS = build_moveset()
+
+# Every quarter turn as a [face, direction] action, indexed by move id
+ACTIONS = QUARTER_TURNS['actions']
+
+# Gathers applying each move in a single C-level call
+_GATHER = {move: itemgetter(*perm) for move, perm in MOVES.items()}
+
+# Color of every square of the solved cube: the color of its face's center, which
+# never moves on an odd cube
+_FACE_COLORS = tuple(i // SIZE ** 2 for i in range(6 * SIZE ** 2))
+
+def set_size(n):
+    '''Switch the moves, move sets and solved colors of the module to an n x n x n cube
+    (n from 2 to 7), recompiling the macros already defined. Symmetry reduction, the
+    pattern databases, the two-phase solver and the solution cache only know the
+    3x3x3 cube.'''
+    global SIZE, _FACE_COLORS
+    if not 2 <= n <= 7:
+        raise ValueError(f'cubes of 2 to 7 squares per row are supported, not {n}')
+    SIZE = n
+    LAYERS.clear()
+    LAYERS.update(layer_names(n))
+    MOVES.clear()
+    MOVES.update(generate_moves(n))
+    for name, actions in MACROS.items():
+        MOVES[name, 'MACRO'] = compile_sequence(actions)
+    _FACE_COLORS = tuple(i // n ** 2 for i in range(6 * n ** 2))
+    _GATHER.clear()
+    for move, perm in MOVES.items():
+        _GATHER[move] = itemgetter(*perm)
+
+    # Update the default move set in place, as the solvers hold references to it
+    QUARTER_TURNS.update(build_moveset())
+    ACTIONS[:] = QUARTER_TURNS['actions']
+
+def define_macro(name, actions):
+    '''Define a macro move: a named sequence of actions compiled into a single
+    permutation, which build_moveset() can offer to searches as one move.
+    Raises ValueError for a name that parse_moves() or printSolution() could confuse
+    with a layer turn of any cube size, or with a list of moves.'''
+    layers = {layer for n in range(2, 8) for layer in layer_names(n)}
+    if not name or name in layers or name.endswith('2') or name.startswith('Shift+') or ',' in name:
+        raise ValueError(f'macro name {name!r} must not be a layer, end in 2, start with Shift+ or hold a comma')
+    MOVES[name, 'MACRO'] = compile_sequence(actions)
+    MACROS[name] = expand(actions)
+    _GATHER[name, 'MACRO'] = itemgetter(*MOVES[name, 'MACRO'])
+
+def use_cube(size, macros):
+    '''Switch a worker process to the cube size and macro moves (a dict like MACROS)
+    of the process that started it, which it does not inherit unless it was forked.'''
+    set_size(size)
+    for name, actions in macros.items():
+        define_macro(name, actions)
+
+def expand(actions):
+    '''Replace the macro moves in a sequence of actions by the face turns they stand for.'''
+    expanded = []
+    for face, direction in actions:
+        if direction == 'MACRO':
+            expanded += MACROS[face]
+        else:
+            expanded.append([face, direction])
+    return expanded
+
+def invert(actions):
+    '''Return the face turns that undo a sequence of actions.'''
+    inverse = {'CW': 'CCW', 'CCW': 'CW', '180': '180'}
+    return [[face, inverse[direction]] for face, direction in reversed(expand(actions))]
+
+def parse_moves(text):
+    '''Parse a sequence of moves written as printSolution() prints them, such as
+    "R, U, Shift+R, F2", into a list of [face, direction] actions.'''
+    actions = []
+    for move in text.split(','):
+        move = move.strip()
+        if move.startswith('Shift+') and move[6:] in LAYERS:
+            actions.append([move[6:], 'CCW'])
+        elif move.endswith('2') and move[:-1] in LAYERS:
+            actions.append([move[:-1], '180'])
+        elif move in LAYERS:
+            actions.append([move, 'CW'])
+        elif move in MACROS:
+            actions.append([move, 'MACRO'])
+        else:
+            raise ValueError(f'unknown move {move!r}')
+    return actions
+
+def move_table(actions):
+    '''Return the permutations of a list of actions as a NumPy integer array of shape
+    (len(actions), 54), for expand_block().'''
+    import numpy as np
+    return np.array([MOVES[face, direction] for face, direction in actions], dtype=np.intp)
+
+def expand_block(states, moves):
+    '''Apply every move of a move table (see move_table) to a block of states with a
+    single gather. states is a uint8 array of shape (B, 54); the result has shape
+    (B * len(moves), 54), with the children of states[i] in rows i*len(moves) onward.'''
+    return states[:, moves].reshape(-1, states.shape[1])
+
+def misplaced_block(states):
+    '''Count the misplaced squares of every state in a block, as misplaced() does.'''
+    return (states != _FACE_COLORS).sum(axis=1)
+
+def apply_move(state, face, direction='CW'):
+    '''Return the new immutable state (bytes) after turning one face of a state.'''
+    return bytes(_GATHER[face, direction](state))
+
 def rotate(state, face, direction='CW'):
-    '''Rotate the cube face (U/D/L/R/B/F) in a given direction (CW/CCW).'''
-    if face == 'U':
-        src = [9, 10, 11, 18, 19, 20, 27, 28, 29, 36, 37, 38, 0, 1, 2, 5, 8, 7, 6, 3]
-        if direction == 'CW':
-            dst = [36, 37, 38, 9, 10, 11, 18, 19, 20, 27, 28, 29, 2, 5, 8, 7, 6, 3, 0, 1]
-        elif direction == 'CCW':
-            dst = [18, 19, 20, 27, 28, 29, 36, 37, 38, 9, 10, 11, 6, 3, 0, 1, 2, 5, 8, 7]
-
-    elif face == 'D':
-        src = [45, 46, 47, 50, 53, 52, 51, 48, 15, 16, 17, 24, 25, 26, 33, 34, 35, 42, 43, 44]
-        if direction == 'CW':
-            dst = [47, 50, 53, 52, 51, 48, 45, 46, 24, 25, 26, 33, 34, 35, 42, 43, 44, 15, 16, 17]
-        elif direction == 'CCW':
-            dst = [51, 48, 45, 46, 47, 50, 53, 52, 42, 43, 44, 15, 16, 17, 24, 25, 26, 33, 34, 35]
-
-    elif face == 'L':
-        src = [0, 3, 6, 18, 21, 24, 45, 48, 51, 38, 41, 44, 9, 10, 11, 12, 14, 15, 16, 17]
-        if direction == 'CW':
-            dst = [18, 21, 24, 45, 48, 51, 44, 41, 38, 6, 3, 0, 11, 14, 17, 10, 16, 9, 12, 15]
-        elif direction == 'CCW':
-            dst = [44, 41, 38, 0, 3, 6, 18, 21, 24, 51, 48, 45, 15, 12, 9, 16, 10, 17, 14, 11]
-
-    elif face == 'R':
-        src = [2, 5, 8, 20, 23, 26, 47, 50, 53, 36, 39, 42, 27, 28, 29, 30, 32, 33, 34, 35]
-        if direction == 'CW':
-            dst = [42, 39, 36, 2, 5, 8, 20, 23, 26, 53, 50, 47, 29, 32, 35, 28, 34, 27, 30, 33]
-        elif direction == 'CCW':
-            dst = [20, 23, 26, 47, 50, 53, 42, 39, 36, 8, 5, 2, 33, 30, 27, 34, 28, 35, 32, 29]
-
-    elif face == 'B':
-        src = [36, 37, 38, 41, 44, 43, 42, 39, 2, 1, 0, 9, 12, 15, 51, 52, 53, 35, 32, 29]
-        if direction == 'CW':
-            dst = [38, 41, 44, 43, 42, 39, 36, 37, 9, 12, 15, 51, 52, 53, 35, 32, 29, 2, 1, 0]
-        elif direction == 'CCW':
-            dst = [42, 39, 36, 37, 38, 41, 44, 43, 35, 32, 29, 2, 1, 0, 9, 12, 15, 51, 52, 53]
-
-    elif face == 'F':
-        src = [18, 19, 20, 23, 26, 25, 24, 21, 6, 7, 8, 27, 30, 33, 47, 46, 45, 17, 14, 11]
-        if direction == 'CW':
-            dst = [20, 23, 26, 25, 24, 21, 18, 19, 27, 30, 33, 47, 46, 45, 17, 14, 11, 6, 7, 8]
-        elif direction == 'CCW':
-            dst = [24, 21, 18, 19, 20, 23, 26, 25, 17, 14, 11, 6, 7, 8, 27, 30, 33, 47, 46, 45]
-
-    temp = state.copy()
-    for i, j in zip(src, dst):
-        state[j] = temp[i]
+    '''Rotate the cube face (U/D/L/R/B/F) in a given direction (CW/CCW/180).'''
+    state[:] = _GATHER[face, direction](state)
 
 def recolor(gui, state, params):
     '''Recolor the cube in the GUI.'''
@@ -324,17 +1591,84 @@ def recolor(gui, state, params):
 
 def simulate(state, node):
     '''Simulate rotating the cube from an input state to determine resulting state. 
-    The input node is a sequence of rotations.'''
-    s = state.copy()  # copy the state so that we don't change the actual cube!
-    # ***ENTER CODE HERE***  (4 lines)
-    
+    The input node is a sequence of rotations. The result is a new immutable
+    state (bytes), so the actual cube is never changed.'''
     # If Node is Empty, Return Unmodified State
     if node == []:
-        return s
+        return bytes(state)
     
-    rotate(s, node[-1][0], node[-1][1])
-        
-    return s
+    return apply_move(state, node[-1][0], node[-1][1])
+
+def _compile_symmetries():
+    '''Build the 48 symmetries of the cube (24 rotations, each with and without a
+    mirror) as (sticker permutation, color relabeling) pairs. A symmetry maps a state s
+    to the state [relabel[s[perm[0]]], relabel[s[perm[1]]], ...]. The relabeling puts
+    every center back to its own color, so the solved cube maps to itself and every
+    state keeps its distance to the solved cube. The identity comes first.'''
+    geometry = _sticker_geometry()
+    index = {square: i for i, square in enumerate(geometry)}
+    symmetries = []
+    for axes in permutations(range(3)):
+        for signs in product([1, -1], repeat=3):
+            def transform(v):
+                return tuple(signs[k] * v[axes[k]] for k in range(3))
+            perm = [0] * 54
+            for j, (position, normal) in enumerate(geometry):
+                perm[index[transform(position), transform(normal)]] = j
+            relabel = [_NORMALS.index(transform(normal)) for normal in _NORMALS]
+            symmetries.append((tuple(perm), tuple(relabel)))
+    return symmetries
+
+# The 48 cube symmetries as (sticker permutation, color relabeling) pairs
+SYMMETRIES = _compile_symmetries()
+
+# Gathers and translation tables applying each symmetry in two C-level calls
+_SYMMETRY_GATHERS = [(itemgetter(*perm), bytes.maketrans(bytes(range(6)), bytes(relabel)))
+                     for perm, relabel in SYMMETRIES]
+
+def canonical(state):
+    '''Return the representative of the symmetry class of a state: the smallest of its
+    48 symmetric images. States with the same representative are the same distance
+    from the solved cube, so tables keyed by distance can share one entry per class.'''
+    return min(bytes(gather(state)).translate(table) for gather, table in _SYMMETRY_GATHERS)
+
+def canonical_symmetry(state):
+    '''Return (k, canonical(state)) where SYMMETRIES[k] maps the state to its representative.'''
+    image, k = min((bytes(gather(state)).translate(table), k)
+                   for k, (gather, table) in enumerate(_SYMMETRY_GATHERS))
+    return k, image
+
+def _compile_symmetry_moves():
+    '''For every symmetry, map each face turn (face, direction) to the face turn it
+    becomes: if a move takes s to t, its image takes the symmetric image of s to the
+    symmetric image of t. Mirror symmetries swap clockwise and counterclockwise.'''
+    by_perm = {perm: move for move, perm in MOVES.items() if move[0] in OPPOSITE}
+    tables = []
+    for perm, _ in SYMMETRIES:
+        inverse = [0] * 54
+        for i, j in enumerate(perm):
+            inverse[j] = i
+        tables.append({move: by_perm[tuple(inverse[MOVES[move][perm[i]]] for i in range(54))]
+                       for move in by_perm.values()})
+    return tables
+
+# Image of every face turn under each symmetry, indexed like SYMMETRIES
+_SYMMETRY_MOVES = _compile_symmetry_moves()
+
+# Translation tables between sticker colors (0-5) and octal digit characters
+_TO_OCTAL = bytes.maketrans(bytes(range(8)), b'01234567')
+_FROM_OCTAL = bytes.maketrans(b'01234567', bytes(range(8)))
+
+def pack(state):
+    '''Pack a cube state into a single integer, 3 bits per sticker.
+    The packed state is hashable and compares in one step, so it is used as the
+    key of the visited set and as the state stored in the open list.'''
+    return int(bytes(state).translate(_TO_OCTAL), 8)
+
+def unpack(key, size=None):
+    '''Unpack an integer made by pack() into a bytes object of sticker colors, for a
+    cube of the current size unless size (the number of squares) is given.'''
+    return format(key, f'0{size or 6 * SIZE ** 2}o').encode().translate(_FROM_OCTAL)
 
 def printSolution(actions):
     # Initialize Result String
@@ -344,6 +1678,8 @@ def printSolution(actions):
     for action in actions:
         if action[1] == 'CCW':
             str += f'Shift+{action[0]}, '
+        elif action[1] == '180':
+            str += f'{action[0]}2, '
         else:
             str += f'{action[0]}, '
             
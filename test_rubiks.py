@@ -0,0 +1,38 @@
+'''Tests for rubiks.py: the layer turns generated from the geometry of the cube
+against the face turns of the 3x3x3 cube written out by hand.'''
+
+import rubiks
+
+# Stickers moved by each face turn as (src, CW dst, CCW dst): the sticker at src[k] moves to dst[k]
+ROTATIONS = {
+    'U': ([9, 10, 11, 18, 19, 20, 27, 28, 29, 36, 37, 38, 0, 1, 2, 5, 8, 7, 6, 3],
+          [36, 37, 38, 9, 10, 11, 18, 19, 20, 27, 28, 29, 2, 5, 8, 7, 6, 3, 0, 1],
+          [18, 19, 20, 27, 28, 29, 36, 37, 38, 9, 10, 11, 6, 3, 0, 1, 2, 5, 8, 7]),
+    'D': ([45, 46, 47, 50, 53, 52, 51, 48, 15, 16, 17, 24, 25, 26, 33, 34, 35, 42, 43, 44],
+          [47, 50, 53, 52, 51, 48, 45, 46, 24, 25, 26, 33, 34, 35, 42, 43, 44, 15, 16, 17],
+          [51, 48, 45, 46, 47, 50, 53, 52, 42, 43, 44, 15, 16, 17, 24, 25, 26, 33, 34, 35]),
+    'L': ([0, 3, 6, 18, 21, 24, 45, 48, 51, 38, 41, 44, 9, 10, 11, 12, 14, 15, 16, 17],
+          [18, 21, 24, 45, 48, 51, 44, 41, 38, 6, 3, 0, 11, 14, 17, 10, 16, 9, 12, 15],
+          [44, 41, 38, 0, 3, 6, 18, 21, 24, 51, 48, 45, 15, 12, 9, 16, 10, 17, 14, 11]),
+    'R': ([2, 5, 8, 20, 23, 26, 47, 50, 53, 36, 39, 42, 27, 28, 29, 30, 32, 33, 34, 35],
+          [42, 39, 36, 2, 5, 8, 20, 23, 26, 53, 50, 47, 29, 32, 35, 28, 34, 27, 30, 33],
+          [20, 23, 26, 47, 50, 53, 42, 39, 36, 8, 5, 2, 33, 30, 27, 34, 28, 35, 32, 29]),
+    'B': ([36, 37, 38, 41, 44, 43, 42, 39, 2, 1, 0, 9, 12, 15, 51, 52, 53, 35, 32, 29],
+          [38, 41, 44, 43, 42, 39, 36, 37, 9, 12, 15, 51, 52, 53, 35, 32, 29, 2, 1, 0],
+          [42, 39, 36, 37, 38, 41, 44, 43, 35, 32, 29, 2, 1, 0, 9, 12, 15, 51, 52, 53]),
+    'F': ([18, 19, 20, 23, 26, 25, 24, 21, 6, 7, 8, 27, 30, 33, 47, 46, 45, 17, 14, 11],
+          [20, 23, 26, 25, 24, 21, 18, 19, 27, 30, 33, 47, 46, 45, 17, 14, 11, 6, 7, 8],
+          [24, 21, 18, 19, 20, 23, 26, 25, 17, 14, 11, 6, 7, 8, 27, 30, 33, 47, 46, 45]),
+}
+
+def test_generated_face_turns_match_hand_written():
+    '''Every quarter and half turn generated for the 3x3x3 cube moves the stickers
+    like the hand-written tables, a half turn being two clockwise quarter turns.'''
+    generated = rubiks.generate_moves(3)
+    for face, (src, cw, ccw) in ROTATIONS.items():
+        for direction, dst in [('CW', cw), ('CCW', ccw)]:
+            perm = list(range(54))
+            for i, j in zip(src, dst):
+                perm[j] = i
+            assert generated[face, direction] == tuple(perm), (face, direction)
+        assert generated[face, '180'] == rubiks.compose(generated[face, 'CW'], generated[face, 'CW']), face